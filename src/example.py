@@ -6,21 +6,163 @@ import struct
 import zipfile
 import io
 import getpass
+import shutil
+import mmap
+import zlib
+import collections
+import concurrent.futures
+import time
+import threading
+import csv
+import json
+import bisect
+import array
+import functools
+import contextlib
+import multiprocessing
+import platform
+import random
+import tempfile
+import cProfile
 
 from PIL import Image
 
+try:
+    import resource  # peak memory reporting; not on Windows
+except ImportError:
+    resource = None
+try:
+    import numpy as np
+except ImportError:  # fall back to the pure-Python pixel loops
+    np = None
+
 # === Optional crypto (LSB only) ===
-from base64 import urlsafe_b64encode
+from base64 import urlsafe_b64encode, urlsafe_b64decode
 from hashlib import sha256
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC  # type: ignore
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt  # type: ignore
 from cryptography.hazmat.primitives import hashes  # type: ignore
 from cryptography.hazmat.backends import default_backend  # type: ignore
-from cryptography.fernet import Fernet  # type: ignore
+from cryptography.fernet import Fernet, InvalidToken  # type: ignore
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM  # type: ignore
+from cryptography.exceptions import InvalidTag  # type: ignore
 import secrets
 
 APPEND_MAGIC = b"STEGOBX\x00APPEND\x00"
 LSB_MAGIC = b"STEGOBX\x00LSB\x00"
-VERSION = 1
+VERSION = 2  # format written by default; readers accept 1 and 2
+APPEND_FOOTER_LEN = len(APPEND_MAGIC) + 4 + 8
+# v1: LSB_MAGIC + u32 version + enc_flag(1) + u32 total_len
+LSB_HEADER_LEN = len(LSB_MAGIC) + 4 + 1 + 4
+# v2: LSB_MAGIC + u32 version + u8 bits + u64 body_len (body: see Container v2)
+LSB_V2_HEADER_LEN = len(LSB_MAGIC) + 4 + 1 + 8
+LSB_MAX_BITS = 4  # low bits per sample the body may use; headers always use 1
+CHUNK_SIZE = 1024 * 1024
+ENC_CHUNK_SIZE = 64 * 1024  # plaintext bytes per AES-GCM chunk
+# Lossless save options per encoder profile and output format. The format
+# follows the output extension (.bmp, .tif/.tiff); anything else is PNG.
+# "balanced" is Pillow's default PNG encode, i.e. the historic output.
+ENCODER_PROFILES = {
+    "fastest": {"PNG": {"compress_level": 1}, "TIFF": {}, "BMP": {}},
+    "balanced": {"PNG": {}, "TIFF": {"compression": "tiff_lzw"}, "BMP": {}},
+    "smallest": {"PNG": {"optimize": True}, "TIFF": {"compression": "tiff_adobe_deflate"}, "BMP": {}},
+}
+DEFAULT_PROFILE = "balanced"
+STEGO_FORMATS = {".bmp": "BMP", ".tif": "TIFF", ".tiff": "TIFF"}
+BMP_MODES = ("RGB", "L")  # BMP drops alpha and has no 16-bit samples
+
+# ---------- Stage timing ----------
+# Core functions report where their time goes as stage events: dicts with
+# stage, seconds, bytes (None when there is no natural count), start
+# (perf_counter) and depth (nesting within the thread). Durations include
+# nested stages, e.g. "zip" runs inside "container" when a folder is
+# streamed. Observers get every event of every thread in this process;
+# with none registered a stage costs a list check.
+_stage_observers = []
+_stage_local = threading.local()
+
+def add_stage_observer(fn):
+    _stage_observers.append(fn)
+
+def remove_stage_observer(fn):
+    _stage_observers.remove(fn)
+
+def _emit_stage(name: str, seconds: float, nbytes=None, start: float = None, depth: int = None):
+    if depth is None:
+        depth = getattr(_stage_local, "depth", 0)
+    event = {"stage": name, "seconds": seconds, "bytes": nbytes, "start": start, "depth": depth}
+    for fn in list(_stage_observers):
+        fn(event)
+
+class _stage:
+    # with _stage("kdf") as st: ...; set st.bytes inside when known
+    def __init__(self, name: str, nbytes=None):
+        self.name, self.bytes = name, nbytes
+
+    def __enter__(self):
+        self.observed = bool(_stage_observers)
+        if self.observed:
+            self.depth = getattr(_stage_local, "depth", 0)
+            _stage_local.depth = self.depth + 1
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.observed:
+            _stage_local.depth = self.depth
+            _emit_stage(self.name, time.perf_counter() - self.start, self.bytes, self.start, self.depth)
+        return False
+
+def _staged(name: str):
+    # decorator: the whole call is one stage
+    def wrap(fn):
+        @functools.wraps(fn)
+        def staged(*args, **kwargs):
+            with _stage(name):
+                return fn(*args, **kwargs)
+        return staged
+    return wrap
+
+class _StageTotal:
+    # Sums many short sections (one per AEAD chunk, say) into one event.
+    def __init__(self, name: str):
+        self.name, self.seconds, self.bytes, self.start = name, 0.0, 0, None
+
+    def add(self, t0: float, nbytes: int):
+        if self.start is None:
+            self.start = t0
+        self.seconds += time.perf_counter() - t0
+        self.bytes += nbytes
+
+    def emit(self):
+        if _stage_observers:
+            _emit_stage(self.name, self.seconds, self.bytes, self.start)
+
+def stage_percentiles(samples: list, percentiles=(50, 90, 99)) -> dict:
+    # samples: {stage: seconds} dicts, one per run (see batch_embed).
+    # Returns {stage: {"count", "p50", ..., "max"}} by nearest rank.
+    by_stage = collections.defaultdict(list)
+    for sample in samples:
+        for name, seconds in sample.items():
+            by_stage[name].append(seconds)
+    report = {}
+    for name, values in by_stage.items():
+        values.sort()
+        row = {"count": len(values)}
+        for q in percentiles:
+            row[f"p{q:g}"] = values[max(0, -(-len(values) * q // 100) - 1)]
+        row["max"] = values[-1]
+        report[name] = row
+    return report
+
+def format_stage_events(events: list) -> str:
+    # one indented line per stage, in the order the stages started
+    lines = []
+    for e in sorted(events, key=lambda e: (e["start"] is None, e["start"] or 0)):
+        size = f"  {e['bytes']:,} bytes" if e["bytes"] else ""
+        rate = f"  {e['bytes'] / e['seconds'] / 1e6:.1f} MB/s" if e["bytes"] and e["seconds"] else ""
+        lines.append(f"{'  ' * e['depth']}{e['stage']:<{24 - 2 * e['depth']}}{e['seconds']:9.3f}s{size}{rate}")
+    return "\n".join(lines)
 
 # ---------- Utilities ----------
 def read_password(prompt="Password: ", confirm=False):
@@ -35,84 +177,975 @@ def read_password(prompt="Password: ", confirm=False):
             sys.exit(1)
     return pw1
 
-def zip_folder_to_bytes(folder_path: str) -> bytes:
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+def _deflate_block(data: bytes, zdict: bytes, last: bool,
+                   level: int = zlib.Z_DEFAULT_COMPRESSION) -> bytes:
+    # Raw deflate of one block of an entry. Non-final blocks end on a sync
+    # flush, so the pieces concatenate into a single valid deflate stream;
+    # zdict (the previous 32 KiB of the entry) keeps the ratio close to a
+    # one-shot deflate.
+    if zdict:
+        co = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        co = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return co.compress(data) + co.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+def _timed_deflate(data: bytes, zdict: bytes, last: bool):
+    t0 = time.perf_counter()
+    piece = _deflate_block(data, zdict, last)
+    return piece, time.perf_counter() - t0
+
+def _done(value):
+    fut = concurrent.futures.Future()
+    fut.set_result(value)
+    return fut
+
+def _submit(pool, fn, *args):
+    if pool is None:
+        return _done(fn(*args))
+    return pool.submit(fn, *args)
+
+# Extensions whose contents are already compressed; deflating them again
+# burns CPU for little or no size reduction.
+STORED_EXTENSIONS = frozenset("""
+    .jpg .jpeg .png .gif .webp .heic .heif .avif .jxl
+    .mp4 .m4v .mov .mkv .webm .avi .wmv .flv .3gp
+    .mp3 .m4a .aac .ogg .oga .opus .flac .wma
+    .zip .7z .rar .gz .tgz .bz2 .xz .txz .zst .lz4 .lzma .br .cab .jar .apk
+    .docx .xlsx .pptx .odt .ods .odp .epub .woff .woff2
+""".split())
+
+def _should_store(arcname: str, block: bytes) -> bool:
+    # Store known-compressed types outright; otherwise deflate a 64 KiB
+    # sample at level 1 and store the entry if it does not shrink.
+    if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+        return True
+    if len(block) < 4096:
+        return False
+    sample = block[:65536]
+    return len(zlib.compress(sample, 1)) >= len(sample) * 0.97
+
+def format_zip_report(stats: dict) -> str:
+    if not stats.get("entries"):
+        return "ZIP: no entries."
+    # deflate throughput measured on this run, applied to the skipped bytes
+    rate = stats["deflated_bytes"] / stats["deflate_seconds"] if stats["deflate_seconds"] else 0
+    saved = stats["stored_bytes"] / rate if rate else 0.0
+    return (f"ZIP: {stats['entries']} entries, {stats['stored']} stored without deflate "
+            f"({stats['stored_bytes']:,} bytes), ~{saved:.2f}s of deflate skipped, "
+            f"~{stats['stored_est_saving']:,} bytes of deflate output forgone")
+
+def _zip_write_entry(zf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, blocks):
+    # Write one pre-compressed entry into zf. `blocks` yields compressed
+    # pieces; zinfo.CRC / file_size must be set by the time it is exhausted.
+    # Single-piece entries get their sizes in the local header. For longer
+    # ones the local header is rewritten once they are known, as zipfile
+    # does; only when zf.fp cannot seek do they go in a data descriptor
+    # (which streaming readers refuse for stored entries).
+    fp = zf.fp
+    zinfo.header_offset = fp.tell()
+    first = next(blocks)
+    rest = next(blocks, None)
+    if rest is None:
+        zinfo.compress_size = len(first)
+        zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+        fp.write(zinfo.FileHeader(zip64))
+        fp.write(first)
+    else:
+        seekable = hasattr(fp, "seekable") and fp.seekable()
+        if seekable:
+            zinfo.CRC = getattr(zinfo, "CRC", 0)  # placeholder unless known; patched below
+        else:
+            zinfo.flag_bits |= 0x08
+        zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+        fp.write(zinfo.FileHeader(zip64))
+        fp.write(first)
+        fp.write(rest)
+        zinfo.compress_size = len(first) + len(rest)
+        for piece in blocks:
+            fp.write(piece)
+            zinfo.compress_size += len(piece)
+        if not zip64 and max(zinfo.file_size, zinfo.compress_size) > zipfile.ZIP64_LIMIT:
+            raise ValueError(f"{zinfo.filename} grew past 4 GiB while it was being zipped.")
+        if seekable:
+            end = fp.tell()
+            fp.seek(zinfo.header_offset)
+            fp.write(zinfo.FileHeader(zip64))
+            fp.seek(end)
+        else:
+            fmt = "<LLQQ" if zip64 else "<LLLL"
+            fp.write(struct.pack(fmt, 0x08074B50, zinfo.CRC, zinfo.compress_size, zinfo.file_size))
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+    zf.start_dir = fp.tell()
+
+def zip_folder_to_stream(folder_path: str, f, workers: int = None, stats: dict = None):
+    # Files are read in CHUNK_SIZE blocks and deflated on a thread pool
+    # (zlib releases the GIL), with a bounded window of blocks in flight
+    # across file boundaries. Entries are written in walk order and ZipFile
+    # writes the central directory, so the result is an ordinary ZIP.
+    # Already-compressed files are stored; `stats` collects the savings.
+    workers = workers or os.cpu_count() or 1
+    pool = concurrent.futures.ThreadPoolExecutor(workers) if workers > 1 else None
+    limit = workers * 2
+    if stats is None:
+        stats = {}
+    for key in ("entries", "stored", "stored_bytes", "stored_est_saving",
+                "deflated_bytes", "deflate_seconds"):
+        stats.setdefault(key, 0)
+
+    def tasks():
+        # yields (zinfo, future, last) for every block of every file; CRC and
+        # size are set on zinfo before its last block is yielded
         for root, _, files in os.walk(folder_path):
-            for f in files:
-                full = os.path.join(root, f)
+            for name in files:
+                full = os.path.join(root, name)
                 arc = os.path.relpath(full, start=folder_path)
-                zf.write(full, arcname=arc)
+                zinfo = zipfile.ZipInfo.from_file(full, arc, strict_timestamps=False)
+                crc = size = 0
+                zdict = b""
+                with open(full, "rb") as src:
+                    block = src.read(CHUNK_SIZE)
+                    store = _should_store(arc, block)
+                    zinfo.compress_type = zipfile.ZIP_STORED if store else zipfile.ZIP_DEFLATED
+                    stats["entries"] += 1
+                    if store:
+                        stats["stored"] += 1
+                        sample = block[:65536]
+                        ratio = len(zlib.compress(sample, 1)) / len(sample) if sample else 1.0
+                    while True:
+                        nxt = src.read(CHUNK_SIZE) if len(block) == CHUNK_SIZE else b""
+                        crc = zlib.crc32(block, crc)
+                        size += len(block)
+                        if store:
+                            fut = _done((block, 0.0))
+                        else:
+                            fut = _submit(pool, _timed_deflate, block, zdict, not nxt)
+                        if not nxt:
+                            zinfo.CRC, zinfo.file_size = crc, size
+                            if store:
+                                stats["stored_bytes"] += size
+                                stats["stored_est_saving"] += max(0, int(size * (1 - ratio)))
+                            yield zinfo, fut, True
+                            break
+                        yield zinfo, fut, False
+                        zdict = block[-32768:]
+                        block = nxt
+
+    pending = collections.deque()
+    source = tasks()
+
+    def fill():
+        while len(pending) < limit:
+            item = next(source, None)
+            if item is None:
+                return
+            pending.append(item)
+
+    def blocks():
+        while True:
+            fill()
+            zinfo, fut, last = pending.popleft()
+            piece, seconds = fut.result()
+            if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+                stats["deflate_seconds"] += seconds
+            yield piece
+            if last:
+                return
+
+    before = stats["deflated_bytes"] + stats["stored_bytes"]
+    try:
+        with _stage("zip") as st, zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+            fill()
+            while pending:
+                zinfo = pending[0][0]
+                _zip_write_entry(zf, zinfo, blocks())
+                if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+                    stats["deflated_bytes"] += zinfo.file_size
+                fill()
+            st.bytes = stats["deflated_bytes"] + stats["stored_bytes"] - before
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+def zip_folder_to_bytes(folder_path: str, workers: int = None, stats: dict = None) -> bytes:
+    buf = io.BytesIO()
+    zip_folder_to_stream(folder_path, buf, workers, stats)
     return buf.getvalue()
 
-def load_payload(input_folder: str = None, input_zip: str = None) -> bytes:
+def load_payload(input_folder: str = None, input_zip: str = None, workers: int = None) -> bytes:
     if input_zip:
         with open(input_zip, "rb") as f:
             return f.read()
     elif input_folder:
-        return zip_folder_to_bytes(input_folder)
+        return zip_folder_to_bytes(input_folder, workers)
+    else:
+        raise ValueError("Provide --input-folder or --input-zip")
+
+def stream_payload(input_folder: str = None, input_zip: str = None, workers: int = None,
+                   stats: dict = None):
+    # Like load_payload, but returns a callable that writes the payload into
+    # a file object as it is produced instead of building it in memory.
+    if input_zip:
+        def write(f):
+            with open(input_zip, "rb") as src:
+                shutil.copyfileobj(src, f, CHUNK_SIZE)
+        return write
+    elif input_folder:
+        return lambda f: zip_folder_to_stream(input_folder, f, workers, stats)
     else:
         raise ValueError("Provide --input-folder or --input-zip")
 
+class _PayloadWriter(io.RawIOBase):
+    # Writable window onto f starting at its current position. tell() and
+    # seek() are relative to that start, so a ZIP written through it has
+    # the offsets of a standalone archive even when it follows a cover.
+    def __init__(self, f):
+        self._f = f
+        self._start = f.tell()
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return self._f.seekable()
+
+    def write(self, b):
+        return self._f.write(b)
+
+    def tell(self):
+        return self._f.tell() - self._start
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            pos += self._start
+        return self._f.seek(pos, whence) - self._start
+
+class _CappedBuffer(io.BytesIO):
+    # In-memory carrier buffer that refuses to grow past `limit` bytes, so a
+    # streamed payload that cannot fit fails early instead of filling RAM.
+    def __init__(self, limit: int):
+        super().__init__()
+        self._limit = limit
+
+    def write(self, b):
+        if self.tell() + len(memoryview(b)) > self._limit:
+            raise ValueError(f"Payload too large for this image (limit {self._limit} bytes).")
+        return super().write(b)
+
+def _write_payload(f, payload):
+    # payload is bytes-like, a readable binary file object, or a callable
+    # writer such as the ones returned by stream_payload()
+    if callable(payload):
+        payload(f)
+    elif hasattr(payload, "read"):
+        shutil.copyfileobj(payload, f, CHUNK_SIZE)
+    else:
+        f.write(payload)
+
+@contextlib.contextmanager
+def _output_file(path: str):
+    # Binary file for an extracted payload: written as <path>.part and moved
+    # over path only if the block succeeds, so a wrong password or a bad
+    # chunk leaves no empty or truncated output behind.
+    part = path + ".part"
+    try:
+        with open(part, "wb") as f:
+            yield f
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+
+def _read_payload(payload, limit: int) -> bytes:
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return bytes(payload)
+    buf = _CappedBuffer(limit)
+    _write_payload(buf, payload)
+    return buf.getvalue()
+
 # ---------- Append mode ----------
-def append_embed(cover_path: str, payload: bytes, out_path: str):
-    with open(cover_path, "rb") as f:
-        cover = f.read()
-    # structure: [cover][payload][footer]
-    footer = APPEND_MAGIC + struct.pack("<I", VERSION) + struct.pack("<Q", len(payload))
-    stego = cover + payload + footer
-    with open(out_path, "wb") as f:
-        f.write(stego)
-
-def append_extract(stego_path: str, out_zip: str):
-    with open(stego_path, "rb") as f:
-        data = f.read()
-    # scan footer from end
-    if APPEND_MAGIC not in data:
+def _append_footer(payload_len: int, version: int = VERSION) -> bytes:
+    return APPEND_MAGIC + struct.pack("<I", version) + struct.pack("<Q", payload_len)
+
+@_staged("append_embed")
+def append_embed(cover_path: str, payload, out_path: str = None, in_place: bool = False,
+                 password: str = None, session: "CryptoSession" = None, kdf: "KdfParams" = None,
+                 version: int = VERSION):
+    # structure: [cover][payload][footer]; with version 2 the payload is a
+    # container body, optionally encrypted
+    if version == 1 and password:
+        raise ValueError("Format 1 append payloads cannot be encrypted.")
+    if in_place == bool(out_path):
+        raise ValueError("Provide either an output path or in_place=True.")
+    # a new carrier is built as <out_path>.part and moved over out_path once
+    # its footer is written, as _output_file does for extraction
+    target = cover_path if in_place else out_path + ".part"
+    try:
+        if not in_place:
+            # copyfile uses the kernel copy fast paths (sendfile/fcopyfile) when it can
+            with _stage("copy_cover", os.path.getsize(cover_path)):
+                shutil.copyfile(cover_path, target)
+        with open(target, "r+b") as f:
+            cover_end = f.seek(0, os.SEEK_END)
+            try:
+                if version == 1:
+                    with _stage("payload") as st:
+                        _write_payload(_PayloadWriter(f), payload)
+                        st.bytes = f.tell() - cover_end
+                else:
+                    write_container(f, payload, password, session, kdf)
+                payload_len = f.seek(0, os.SEEK_END) - cover_end
+                f.write(_append_footer(payload_len, version))
+            except BaseException:
+                if in_place:
+                    # leave the original cover as we found it
+                    f.truncate(cover_end)
+                raise
+    except BaseException:
+        if not in_place and os.path.exists(target):
+            os.remove(target)
+        raise
+    if not in_place:
+        os.replace(target, out_path)
+
+def read_append_footer(f):
+    # footer = MAGIC + u32 version + u64 payload_len, always the last
+    # APPEND_FOOTER_LEN bytes of the file. Returns (version, start, length).
+    size = f.seek(0, os.SEEK_END)
+    if size < APPEND_FOOTER_LEN:
+        raise ValueError("No append footer found.")
+    f.seek(size - APPEND_FOOTER_LEN)
+    footer = f.read(APPEND_FOOTER_LEN)
+    if not footer.startswith(APPEND_MAGIC):
         raise ValueError("No append footer found.")
-    idx = data.rfind(APPEND_MAGIC)
-    footer = data[idx:]
-    # footer = MAGIC + u32 version + u64 payload_len
-    if len(footer) < len(APPEND_MAGIC) + 4 + 8:
-        raise ValueError("Corrupt footer.")
-    magic = footer[:len(APPEND_MAGIC)]
     version = struct.unpack("<I", footer[len(APPEND_MAGIC):len(APPEND_MAGIC)+4])[0]
-    payload_len = struct.unpack("<Q", footer[len(APPEND_MAGIC)+4:len(APPEND_MAGIC)+12])[0]
-    payload_start = len(data) - (len(APPEND_MAGIC) + 4 + 8) - payload_len
-    payload = data[payload_start:payload_start+payload_len]
-    with open(out_zip, "wb") as f:
-        f.write(payload)
+    if version not in (1, 2):
+        raise ValueError(f"Unsupported append format version {version}.")
+    payload_len = struct.unpack("<Q", footer[len(APPEND_MAGIC)+4:])[0]
+    payload_start = size - APPEND_FOOTER_LEN - payload_len
+    if payload_start < 0:
+        raise ValueError("Corrupt footer.")
+    return version, payload_start, payload_len
+
+def _copy_range(f, start: int, length: int, out):
+    # Write f[start:start+length] to out straight from a read-only mapping;
+    # fall back to plain reads where the file cannot be mapped.
+    if length == 0:
+        return
+    end = start + length
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, OverflowError):
+        f.seek(start)
+        while start < end:
+            chunk = f.read(min(CHUNK_SIZE, end - start))
+            if not chunk:
+                raise ValueError("Corrupt footer (payload truncated).")
+            out.write(chunk)
+            start += len(chunk)
+        return
+    with mm, memoryview(mm) as view:
+        for off in range(start, end, CHUNK_SIZE):
+            out.write(view[off:min(off + CHUNK_SIZE, end)])
+
+def _file_read_at(f, base: int):
+    # read_at(offset, n) over f from base, for parse_container
+    def read_at(offset: int, n: int) -> bytes:
+        f.seek(base + offset)
+        return f.read(n)
+    return read_at
+
+@_staged("append_extract")
+def append_extract(stego_path: str, out_zip: str, password: str = None,
+                   session: "CryptoSession" = None):
+    with open(stego_path, "rb") as f:
+        version, payload_start, payload_len = read_append_footer(f)
+        if version == 1:
+            with _output_file(out_zip) as out, _stage("copy_payload", payload_len):
+                _copy_range(f, payload_start, payload_len, out)
+            return
+        read_at = _file_read_at(f, payload_start)
+        info = parse_container(read_at, payload_len)
+        if info.enc and not password:
+            raise ValueError("Password required to decrypt.")
+        with _output_file(out_zip) as out:
+            extract_container(read_at, payload_len, out, password, session)
+
+def open_append_payload(stego_path: str, password: str = None,
+                        session: "CryptoSession" = None) -> io.RawIOBase:
+    # Seekable, lazily read file object over the appended payload; pass it
+    # to zipfile.ZipFile to list or pull single members. Close it when done.
+    f = open(stego_path, "rb")
+    try:
+        version, payload_start, payload_len = read_append_footer(f)
+        read_at = _file_read_at(f, payload_start)
+        if version == 1:
+            return _raw_payload_file(read_at, payload_len, f.close)
+        return _container_payload_file(read_at, payload_len, password, session, f.close)
+    except BaseException:
+        f.close()
+        raise
 
 # ---------- Crypto helpers (LSB) ----------
-def derive_key(password: str, salt: bytes) -> bytes:
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=200_000,
-        backend=default_backend(),
-    )
-    key = urlsafe_b64encode(kdf.derive(password.encode("utf-8")))
+# KDF choice and cost travel with every encrypted blob (see _pack_kdf), so
+# they can be tuned per deployment without breaking older files.
+KdfParams = collections.namedtuple("KdfParams", ["algorithm", "iterations", "n", "r", "p"],
+                                   defaults=(0, 0, 0, 0))
+DEFAULT_KDF = KdfParams("pbkdf2", iterations=200_000)
+# Cost ceilings, checked for written and read descriptors alike: a carrier
+# header decides what its reader spends before the password is checked.
+KDF_MAX_ITERATIONS = 10_000_000
+KDF_MAX_MEMORY = 2 ** 30  # scrypt needs 128 * N * r bytes
+KDF_MAX_PARALLEL = 16
+_KDF_IDS = {"pbkdf2": 1, "scrypt": 2}
+_KDF_PARAM_LEN = {b"\x01": 4, b"\x02": 3}
+
+def _check_kdf(kdf: KdfParams) -> KdfParams:
+    # the same bounds apply to decrypt, so no header can ask for more
+    if kdf.algorithm == "pbkdf2":
+        ok = 1_000 <= kdf.iterations <= KDF_MAX_ITERATIONS
+    elif kdf.algorithm == "scrypt":
+        ok = (2 <= kdf.n and kdf.n & (kdf.n - 1) == 0 and 1 <= kdf.r and 1 <= kdf.p <= KDF_MAX_PARALLEL
+              and 128 * kdf.n * kdf.r <= KDF_MAX_MEMORY)
+    else:
+        ok = False
+    if not ok:
+        raise ValueError(f"Unsupported KDF parameters: {format_kdf(kdf)}")
+    return kdf
+
+def parse_kdf(spec: str) -> KdfParams:
+    # "pbkdf2:ITERATIONS" or "scrypt:N:R:P", as printed by `calibrate`
+    parts = spec.strip().lower().split(":")
+    try:
+        if parts[0] == "pbkdf2" and len(parts) == 2:
+            return _check_kdf(KdfParams("pbkdf2", iterations=int(parts[1])))
+        if parts[0] == "scrypt" and len(parts) == 4:
+            return _check_kdf(KdfParams("scrypt", n=int(parts[1]), r=int(parts[2]), p=int(parts[3])))
+    except ValueError:
+        pass
+    raise ValueError(f"Bad KDF spec {spec!r} (use pbkdf2:ITERATIONS or scrypt:N:R:P).")
+
+def format_kdf(kdf: KdfParams) -> str:
+    if kdf.algorithm == "pbkdf2":
+        return f"pbkdf2:{kdf.iterations}"
+    return f"{kdf.algorithm}:{kdf.n}:{kdf.r}:{kdf.p}"
+
+def default_kdf() -> KdfParams:
+    spec = os.environ.get("STEGOBOX_KDF")
+    return parse_kdf(spec) if spec else DEFAULT_KDF
+
+def _pack_kdf(kdf: KdfParams) -> bytes:
+    # kdf_id(1) + params: pbkdf2 -> u32 iterations; scrypt -> u8 log2(N), u8 r, u8 p
+    if kdf.algorithm == "pbkdf2":
+        return struct.pack("<BI", _KDF_IDS["pbkdf2"], kdf.iterations)
+    return struct.pack("<BBBB", _KDF_IDS["scrypt"], kdf.n.bit_length() - 1, kdf.r, kdf.p)
+
+def _unpack_kdf(blob: bytes, offset: int):
+    # returns (KdfParams, offset past the descriptor)
+    try:
+        kdf_id = blob[offset]
+        if kdf_id == _KDF_IDS["pbkdf2"]:
+            iterations = struct.unpack_from("<I", blob, offset + 1)[0]
+            return _check_kdf(KdfParams("pbkdf2", iterations=iterations)), offset + 5
+        if kdf_id == _KDF_IDS["scrypt"]:
+            log_n, r, p = struct.unpack_from("<BBB", blob, offset + 1)
+            return _check_kdf(KdfParams("scrypt", n=1 << log_n, r=r, p=p)), offset + 4
+    except (IndexError, struct.error):
+        raise ValueError("Corrupt encrypted blob.") from None
+    raise ValueError(f"Unsupported KDF id {kdf_id}.")
+
+def derive_key(password: str, salt: bytes, kdf: KdfParams = DEFAULT_KDF) -> bytes:
+    if kdf.algorithm == "scrypt":
+        kdf_impl = Scrypt(salt=salt, length=32, n=kdf.n, r=kdf.r, p=kdf.p, backend=default_backend())
+    else:
+        kdf_impl = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=kdf.iterations,
+            backend=default_backend(),
+        )
+    with _stage("kdf"):
+        key = urlsafe_b64encode(kdf_impl.derive(password.encode("utf-8")))
     return key
 
-def encrypt_payload(password: str, payload: bytes) -> bytes:
-    salt = secrets.token_bytes(16)
-    key = derive_key(password, salt)
-    token = Fernet(key).encrypt(payload)
-    # package: salt_len(1) + salt + token_len(8) + token
+def calibrate_kdf(algorithm: str = "pbkdf2", target_ms: float = 500.0):
+    # Picks the cost that makes one derivation take about target_ms on this
+    # host. Returns (KdfParams, measured_ms).
+    password, salt = "calibrate", secrets.token_bytes(16)
+
+    def measure(kdf):
+        t0 = time.perf_counter()
+        derive_key(password, salt, kdf)
+        return (time.perf_counter() - t0) * 1000
+
+    def scaled(iterations, ms):
+        iterations = max(100_000, int(iterations * target_ms / max(ms, 1e-3)) // 1000 * 1000)
+        return _check_kdf(KdfParams("pbkdf2", iterations=min(iterations, KDF_MAX_ITERATIONS)))
+
+    if algorithm == "pbkdf2":
+        # the first derivation pays one-off backend and cache warm-up
+        probe_kdf = KdfParams("pbkdf2", iterations=50_000)
+        measure(probe_kdf)
+        kdf = scaled(probe_kdf.iterations, measure(probe_kdf))
+        # a short probe extrapolates loosely; correct once at full cost
+        kdf = scaled(kdf.iterations, measure(kdf))
+        return kdf, measure(kdf)
+    if algorithm == "scrypt":
+        # scrypt cost is doubled through N (memory = 128 * N * r bytes)
+        kdf = KdfParams("scrypt", n=2 ** 14, r=8, p=1)
+        measure(kdf)  # warm-up, discarded
+        ms = measure(kdf)
+        while ms * 2 <= target_ms * 1.4 and kdf.n < 2 ** 20:
+            kdf = kdf._replace(n=kdf.n * 2)
+            ms = measure(kdf)
+        return kdf, ms
+    raise ValueError(f"Unknown KDF {algorithm!r}.")
+
+class CryptoSession:
+    # Caches derived keys for a run of encrypts/decrypts, so a batch that
+    # shares a password (and, on decrypt, a salt) pays the KDF once. The
+    # cache is a bounded LRU keyed on (password, salt, kdf); keys are held
+    # in bytearrays and zeroed by close(). With reuse_salt=True every
+    # encrypt in the session uses one salt, and therefore one derivation.
+    # `kdf` is used for encrypts (default: STEGOBOX_KDF or DEFAULT_KDF).
+    def __init__(self, max_keys: int = 64, reuse_salt: bool = False, kdf: KdfParams = None):
+        self._keys = collections.OrderedDict()
+        self._max_keys = max_keys
+        self._salt = secrets.token_bytes(16) if reuse_salt else None
+        self._lock = threading.Lock()
+        self.kdf = kdf or default_kdf()
+
+    def new_salt(self) -> bytes:
+        return self._salt or secrets.token_bytes(16)
+
+    def derive_key(self, password: str, salt: bytes, kdf: KdfParams = DEFAULT_KDF) -> bytes:
+        k = (password, bytes(salt), kdf)
+        with self._lock:
+            key = self._keys.get(k)
+            if key is not None:
+                self._keys.move_to_end(k)
+                return bytes(key)
+        key = bytearray(derive_key(password, salt, kdf))
+        with self._lock:
+            self._keys[k] = key
+            self._keys.move_to_end(k)
+            while len(self._keys) > self._max_keys:
+                _wipe(self._keys.popitem(last=False)[1])
+        return bytes(key)
+
+    def close(self):
+        with self._lock:
+            for key in self._keys.values():
+                _wipe(key)
+            self._keys.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _wipe(buf: bytearray):
+    buf[:] = bytes(len(buf))
+
+def _session_key(password: str, salt: bytes, kdf: KdfParams, session: CryptoSession = None) -> bytes:
+    if session is not None:
+        return session.derive_key(password, salt, kdf)
+    return derive_key(password, salt, kdf)
+
+def _stream_nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    # STREAM construction: prefix(7) + counter(4) + last flag(1); the flag
+    # makes a truncated stream fail instead of ending early.
+    return prefix + struct.pack(">IB", counter, last)
+
+class _StreamEncryptor(io.RawIOBase):
+    # Push-style side of encrypt_stream: plaintext written here leaves as
+    # envelope chunks on dst, and finish() seals the final (short) chunk.
+    # Lets writer-style payloads (streamed ZIPs) be encrypted on the fly.
+    # Envelope: 0x30 + kdf descriptor + salt_len(1) + salt + nonce_prefix(7)
+    #   + chunk_size(4) + chunks; each chunk is AES-256-GCM ciphertext plus
+    #   a 16-byte tag, the header bound in as associated data.
+    def __init__(self, dst, password: str, session: CryptoSession = None,
+                 kdf: KdfParams = None, chunk_size: int = ENC_CHUNK_SIZE):
+        kdf = _check_kdf(kdf or (session.kdf if session is not None else default_kdf()))
+        salt = session.new_salt() if session is not None else secrets.token_bytes(16)
+        self._aead = AESGCM(urlsafe_b64decode(_session_key(password, salt, kdf, session)))
+        self._prefix = secrets.token_bytes(7)
+        self.header = (b"\x30" + _pack_kdf(kdf) + bytes([len(salt)]) + salt + self._prefix
+                       + struct.pack("<I", chunk_size))
+        self._dst = dst
+        self._chunk_size = chunk_size
+        self._buf = bytearray()
+        self._counter = 0
+        self._clock = _StageTotal("encrypt")
+        self.written = 0
+
+    def writable(self):
+        return True
+
+    def _seal(self, chunk, last: bool):
+        if not self.written:
+            self._dst.write(self.header)
+            self.written = len(self.header)
+        t0 = time.perf_counter()
+        sealed = self._aead.encrypt(_stream_nonce(self._prefix, self._counter, last),
+                                    bytes(chunk), self.header)
+        self._clock.add(t0, len(chunk))
+        self._dst.write(sealed)
+        self.written += len(sealed)
+        self._counter += 1
+
+    def write(self, b):
+        self._buf += b
+        # a full chunk is never the last one, so readers can tell the end
+        # by length alone; an exact multiple ends with an empty chunk
+        full = len(self._buf) // self._chunk_size * self._chunk_size
+        if full:
+            with memoryview(self._buf) as view:
+                for off in range(0, full, self._chunk_size):
+                    self._seal(view[off:off + self._chunk_size], False)
+            del self._buf[:full]
+        return len(memoryview(b))
+
+    def finish(self) -> int:
+        # Not close(): IOBase.__del__ closes, and an abandoned stream must
+        # not get a valid final chunk. Returns envelope bytes written.
+        self._seal(self._buf, True)
+        self._buf = bytearray()
+        self._clock.emit()
+        return self.written
+
+def encrypt_stream(password: str, src, dst, session: CryptoSession = None,
+                   kdf: KdfParams = None, chunk_size: int = ENC_CHUNK_SIZE) -> int:
+    # Reads plaintext from file-like src until EOF and writes the 0x30
+    # envelope to dst, one chunk in memory at a time. Returns bytes written.
+    enc = _StreamEncryptor(dst, password, session, kdf, chunk_size)
+    shutil.copyfileobj(src, enc, chunk_size)
+    return enc.finish()
+
+def _open_envelope(password: str, src, session: CryptoSession = None):
+    # Reads a 0x30 envelope header from src. Returns (aead, header,
+    # nonce_prefix, chunk_size), everything needed to open any one chunk.
+    if src.read(1) != b"\x30":
+        raise ValueError("Unsupported encrypted blob format.")
+    kdf_id = src.read(1)
+    kdf = _unpack_kdf(kdf_id + src.read(_KDF_PARAM_LEN.get(kdf_id[:1], 0)), 0)[0]
+    salt_len = src.read(1)
+    if salt_len != b"\x10":
+        raise ValueError("Unsupported salt length.")
+    salt = src.read(16)
+    prefix = src.read(7)
+    raw_size = src.read(4)
+    if len(salt) != 16 or len(prefix) != 7 or len(raw_size) != 4:
+        raise ValueError("Corrupt encrypted blob.")
+    chunk_size = struct.unpack("<I", raw_size)[0]
+    if not 1 <= chunk_size <= 64 * 1024 * 1024:
+        raise ValueError("Corrupt encrypted blob.")
+    header = b"\x30" + _pack_kdf(kdf) + b"\x10" + salt + prefix + raw_size
+    aead = AESGCM(urlsafe_b64decode(_session_key(password, salt, kdf, session)))
+    return aead, header, prefix, chunk_size
+
+def _open_chunk(aead, header: bytes, prefix: bytes, counter: int, last: bool, sealed: bytes) -> bytes:
+    try:
+        return aead.decrypt(_stream_nonce(prefix, counter, last), sealed, header)
+    except InvalidTag:
+        raise ValueError("Incorrect password or corrupt encrypted data.") from None
+
+def decrypt_stream(password: str, src, dst, session: CryptoSession = None) -> int:
+    # Inverse of encrypt_stream for a src positioned at the 0x30 tag.
+    # Returns plaintext bytes written; each chunk is authenticated before
+    # it reaches dst.
+    aead, header, prefix, chunk_size = _open_envelope(password, src, session)
+    written = counter = 0
+    clock = _StageTotal("decrypt")
+    while True:
+        sealed = src.read(chunk_size + 16)
+        last = len(sealed) < chunk_size + 16
+        t0 = time.perf_counter()
+        chunk = _open_chunk(aead, header, prefix, counter, last, sealed)
+        clock.add(t0, len(chunk))
+        dst.write(chunk)
+        written += len(chunk)
+        if last:
+            clock.emit()
+            return written
+        counter += 1
+
+def encrypt_payload(password: str, payload: bytes, session: CryptoSession = None,
+                    kdf: KdfParams = None) -> bytes:
+    out = io.BytesIO()
+    encrypt_stream(password, io.BytesIO(payload), out, session, kdf)
+    return out.getvalue()
+
+def _encrypt_legacy(password: str, payload: bytes, session: CryptoSession = None) -> bytes:
+    # The 0x10 blob of format 1 carriers, which older releases can open:
+    # salt_len(1)=16 + salt + token_len(8) + Fernet token, PBKDF2 200k.
+    salt = session.new_salt() if session is not None else secrets.token_bytes(16)
+    token = Fernet(_session_key(password, salt, DEFAULT_KDF, session)).encrypt(payload)
     return b"\x10" + salt + struct.pack("<Q", len(token)) + token
 
-def decrypt_payload(password: str, blob: bytes) -> bytes:
+def decrypt_payload(password: str, blob: bytes, session: CryptoSession = None) -> bytes:
+    # 0x30: chunked AES-GCM (see encrypt_stream)
+    # 0x10: legacy salt_len(1)=16 + salt + token_len(8) + token, PBKDF2 200k
     if len(blob) < 1 + 16 + 8:
         raise ValueError("Corrupt encrypted blob.")
-    salt_len = blob[0]
-    if salt_len != 16:
-        raise ValueError("Unsupported salt length.")
-    salt = blob[1:1+salt_len]
-    token_len = struct.unpack("<Q", blob[1+salt_len:1+salt_len+8])[0]
-    token = blob[1+salt_len+8:1+salt_len+8+token_len]
-    key = derive_key(password, salt)
-    return Fernet(key).decrypt(token)
+    if blob[0] == 0x30:
+        out = io.BytesIO()
+        decrypt_stream(password, io.BytesIO(blob), out, session)
+        return out.getvalue()
+    if blob[0] != 0x10:
+        raise ValueError("Unsupported encrypted blob format.")
+    salt = blob[1:17]
+    token_len = struct.unpack("<Q", blob[17:25])[0]
+    token = blob[25:25+token_len]
+    key = _session_key(password, salt, DEFAULT_KDF, session)
+    try:
+        return Fernet(key).decrypt(token)
+    except InvalidToken:
+        raise ValueError("Incorrect password or corrupt encrypted data.") from None
+
+# ---------- Container v2 ----------
+# The v2 body carried by both modes (after the LSB header, or between the
+# cover and the append footer):
+#   codec(1) | enc(1) | data | index | data_len(8) | n_chunks(4)
+# index holds n_chunks x (u64 offset, u32 crc32) of data chunks, offsets
+# relative to the start of data. Unencrypted data is cut every
+# CONTAINER_CHUNK_SIZE bytes; encrypted data is a 0x30 envelope whose
+# header precedes the first chunk and whose sealed chunks are the index
+# chunks, so any chunk can be checked (or decrypted) on its own.
+CODEC_ZIP = 0
+CODEC_SHARD = 1  # a slice of a body spread over several covers (see Shards)
+ENC_NONE, ENC_AESGCM = 0, 1
+CONTAINER_CHUNK_SIZE = 64 * 1024
+CONTAINER_TRAILER = struct.Struct("<QI")
+_INDEX_ENTRY = struct.Struct("<QI")
+ContainerInfo = collections.namedtuple("ContainerInfo", ["codec", "enc", "data_len", "chunks"])
+
+class _ChunkIndexer(io.RawIOBase):
+    # Pass-through writer recording (offset, crc32) of every chunk_size
+    # bytes written after the first `start` bytes. Deliberately not
+    # seekable, so a ZIP streamed through it is never patched in place.
+    def __init__(self, f, chunk_size: int = CONTAINER_CHUNK_SIZE, start: int = 0):
+        self._f = f
+        self.chunk_size = chunk_size
+        self.start = start
+        self.pos = 0
+        self.offsets = []
+        self.crcs = []
+        self._fill = 0
+        self._crc = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._f.write(b)
+        with memoryview(b) as view:
+            view = view.cast("B")
+            n = len(view)
+            i = min(max(self.start - self.pos, 0), n)
+            while i < n:
+                if self._fill == 0:
+                    self.offsets.append(self.pos + i)
+                take = min(self.chunk_size - self._fill, n - i)
+                self._crc = zlib.crc32(view[i:i + take], self._crc)
+                self._fill += take
+                i += take
+                if self._fill == self.chunk_size:
+                    self.crcs.append(self._crc)
+                    self._fill = self._crc = 0
+        self.pos += n
+        return n
+
+    def index(self) -> bytes:
+        # index + trailer, closing the current partial chunk
+        crcs = self.crcs + ([self._crc] if self._fill else [])
+        return (b"".join(_INDEX_ENTRY.pack(o, c) for o, c in zip(self.offsets, crcs))
+                + CONTAINER_TRAILER.pack(self.pos, len(self.offsets)))
+
+def write_container(f, payload, password: str = None, session: CryptoSession = None,
+                    kdf: KdfParams = None) -> int:
+    # Writes a v2 body for payload (see _write_payload) to f, encrypting
+    # as it streams when a password is given. Returns bytes written.
+    with _stage("container") as st:
+        f.write(struct.pack("<BB", CODEC_ZIP, ENC_AESGCM if password else ENC_NONE))
+        if password:
+            indexer = _ChunkIndexer(f, ENC_CHUNK_SIZE + 16)
+            enc = _StreamEncryptor(indexer, password, session, kdf)
+            indexer.start = len(enc.header)
+            _write_payload(enc, payload)
+            enc.finish()
+        else:
+            indexer = _ChunkIndexer(f)
+            _write_payload(indexer, payload)
+        tail = indexer.index()
+        f.write(tail)
+        st.bytes = 2 + indexer.pos + len(tail)
+    return st.bytes
+
+def parse_container(read_at, length: int) -> ContainerInfo:
+    # read_at(offset, n) reads from the body; length is the body size the
+    # carrier recorded. Reads only the prefix, the trailer and the index.
+    if length < 2 + CONTAINER_TRAILER.size:
+        raise ValueError("Corrupt container (too short).")
+    codec, enc = struct.unpack("<BB", read_at(0, 2))
+    if codec == CODEC_SHARD:
+        raise ValueError("This image holds one shard of a multi-cover payload; "
+                         "extract all of its covers together (shard-extract).")
+    if codec != CODEC_ZIP:
+        raise ValueError(f"Unsupported container codec {codec}.")
+    if enc not in (ENC_NONE, ENC_AESGCM):
+        raise ValueError(f"Unsupported container encryption {enc}.")
+    data_len, n_chunks = CONTAINER_TRAILER.unpack(read_at(length - CONTAINER_TRAILER.size,
+                                                          CONTAINER_TRAILER.size))
+    index_len = n_chunks * _INDEX_ENTRY.size
+    if 2 + data_len + index_len + CONTAINER_TRAILER.size != length:
+        raise ValueError("Corrupt container (index does not match its length).")
+    entries = list(_INDEX_ENTRY.iter_unpack(read_at(2 + data_len, index_len)))
+    # plain data must be fully covered; encrypted data may start with the
+    # envelope header
+    if enc == ENC_NONE and (entries[0][0] if entries else data_len) != 0:
+        raise ValueError("Corrupt container (bad chunk offsets).")
+    chunks = []
+    for i, (offset, crc) in enumerate(entries):
+        end = entries[i + 1][0] if i + 1 < len(entries) else data_len
+        if not offset < end <= data_len:
+            raise ValueError("Corrupt container (bad chunk offsets).")
+        # (offset within the body, length, crc32)
+        chunks.append((2 + offset, end - offset, crc))
+    return ContainerInfo(codec, enc, data_len, chunks)
+
+def read_chunk(read_at, info: ContainerInfo, i: int) -> bytes:
+    # Stored bytes of chunk i, checked against its index checksum.
+    offset, length, crc = info.chunks[i]
+    data = read_at(offset, length)
+    if len(data) != length or zlib.crc32(data) != crc:
+        raise ValueError(f"Corrupt container (chunk {i} fails its checksum).")
+    return data
+
+class _ContainerReader(io.RawIOBase):
+    # Sequential reader over a container's data section that verifies each
+    # chunk as it is loaded; bytes before the first chunk (the encryption
+    # header, which the AEAD authenticates) are passed through as is.
+    def __init__(self, read_at, info: ContainerInfo):
+        self._read_at = read_at
+        self._info = info
+        self._pending = read_at(2, info.chunks[0][0] - 2) if info.chunks else b""
+        self._next = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        with memoryview(b) as view:
+            n = 0
+            while n < len(view):
+                if not self._pending:
+                    if self._next == len(self._info.chunks):
+                        break
+                    self._pending = read_chunk(self._read_at, self._info, self._next)
+                    self._next += 1
+                take = min(len(self._pending), len(view) - n)
+                view[n:n + take] = self._pending[:take]
+                self._pending = self._pending[take:]
+                n += take
+            return n
+
+class _PayloadFile(io.RawIOBase):
+    # Read-only, seekable view of a hidden payload that decodes one span at
+    # a time, so zipfile can read a central directory and single members
+    # without the rest. spans are the (offset, length) pieces of the
+    # payload in order; load(i) returns the bytes of span i.
+    def __init__(self, spans: list, load, on_close=None):
+        self._spans = spans
+        self._starts = [offset for offset, _ in spans]
+        self._size = spans[-1][0] + spans[-1][1] if spans else 0
+        self._load = load
+        self._on_close = on_close
+        self._pos = 0
+        self._cached = (None, b"")
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            pos += self._pos
+        elif whence == os.SEEK_END:
+            pos += self._size
+        if pos < 0:
+            raise ValueError("negative seek position")
+        self._pos = pos
+        return pos
+
+    def readinto(self, b):
+        with memoryview(b) as view, view.cast("B") as view:
+            n = 0
+            while n < len(view) and self._pos < self._size:
+                i = bisect.bisect_right(self._starts, self._pos) - 1
+                if self._cached[0] != i:
+                    self._cached = (i, self._load(i))
+                data = self._cached[1]
+                off = self._pos - self._spans[i][0]
+                take = min(len(data) - off, len(view) - n)
+                view[n:n + take] = data[off:off + take]
+                n += take
+                self._pos += take
+            return n
+
+    def close(self):
+        if not self.closed and self._on_close is not None:
+            self._on_close()
+        super().close()
+
+def _raw_payload_file(read_at, length: int, on_close=None) -> _PayloadFile:
+    # format 1 payloads have no index; cut them into fixed spans
+    spans = [(o, min(CONTAINER_CHUNK_SIZE, length - o)) for o in range(0, length, CONTAINER_CHUNK_SIZE)]
+    return _PayloadFile(spans, lambda i: read_at(*spans[i]), on_close)
+
+def _container_payload_file(read_at, length: int, password: str = None,
+                            session: CryptoSession = None, on_close=None) -> _PayloadFile:
+    # Seekable view of a v2 body's payload. Each span is one index chunk,
+    # checked against its crc32 and, when encrypted, opened on its own.
+    info = parse_container(read_at, length)
+    if info.enc == ENC_NONE:
+        spans = [(offset - 2, size) for offset, size, _ in info.chunks]
+        return _PayloadFile(spans, lambda i: read_chunk(read_at, info, i), on_close)
+    if not password:
+        raise ValueError("Password required to decrypt.")
+    env = io.BytesIO(read_at(2, info.chunks[0][0] - 2))
+    aead, header, prefix, _ = _open_envelope(password, env, session)
+    spans, pos = [], 0
+    for _, size, _ in info.chunks:
+        spans.append((pos, size - 16))
+        pos += size - 16
+    last = len(info.chunks) - 1
+
+    def load(i):
+        return _open_chunk(aead, header, prefix, i, i == last, read_chunk(read_at, info, i))
+    return _PayloadFile(spans, load, on_close)
+
+def extract_container(read_at, length: int, out, password: str = None,
+                      session: CryptoSession = None) -> int:
+    # Writes the payload of a v2 body to out; returns bytes written.
+    info = parse_container(read_at, length)
+    if info.enc and not password:
+        raise ValueError("Password required to decrypt.")
+    with _stage("unpack", length):
+        if info.enc == ENC_NONE:
+            written = 0
+            for i in range(len(info.chunks)):
+                written += out.write(read_chunk(read_at, info, i))
+            return written
+        return decrypt_stream(password, io.BufferedReader(_ContainerReader(read_at, info)), out, session)
 
 # ---------- Bit packing helpers ----------
 def bytes_to_bits(b: bytes):
@@ -136,100 +1169,1041 @@ def bits_to_bytes(bits_iter, total_bits: int) -> bytes:
         out.append(cur << (8 - cnt))
     return bytes(out)
 
+# ---------- PNG writer ----------
+# A pigz-style PNG encoder for big stego images: rows are filtered and
+# deflated in blocks on a thread pool (numpy and zlib release the GIL) and
+# the sync-flushed pieces form one zlib stream, written one IDAT per block.
+# It decodes to the same pixels as Pillow's encoder; needs numpy.
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# mode -> (PNG colour type, bit depth, raw mode of the scanlines)
+PNG_MODES = {"L": (0, 8, "L"), "RGB": (2, 8, "RGB"), "LA": (4, 8, "LA"), "RGBA": (6, 8, "RGBA"),
+             "I;16": (0, 16, "I;16B"), "I;16B": (0, 16, "I;16B")}
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return (struct.pack(">I", len(data)) + tag + data
+            + struct.pack(">I", zlib.crc32(data, zlib.crc32(tag))))
+
+def _adler32_combine(adler1: int, adler2: int, len2: int) -> int:
+    # Adler-32 of A + B from those of A and B (zlib's adler32_combine)
+    base = 65521
+    rem = len2 % base
+    sum1 = adler1 & 0xFFFF
+    sum2 = rem * sum1 % base
+    sum1 = (sum1 + (adler2 & 0xFFFF) + base - 1) % base
+    sum2 = (sum2 + (adler1 >> 16) + (adler2 >> 16) + base - rem) % base
+    return sum1 | (sum2 << 16)
+
+def _png_filter(rows, prev, bpp: int):
+    # Adaptive filtering as libpng does it: each row takes the filter with
+    # the smallest sum of |signed byte|. rows is (n, stride) uint8 and prev
+    # the row above the first (zeros at the top of the image). Returns
+    # (n, 1 + stride) uint8 scanlines, filter type first.
+    n, stride = rows.shape
+    up = np.vstack((prev[None], rows[:-1]))
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+    upleft = np.zeros_like(rows)
+    upleft[:, bpp:] = up[:, :-bpp]
+    a, b, c = (x.astype(np.int16) for x in (left, up, upleft))
+    pa, pb, pc = np.abs(b - c), np.abs(a - c), np.abs(a + b - 2 * c)
+    paeth = np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, upleft))
+    cands = np.stack((rows, rows - left, rows - up,
+                      rows - ((a + b) >> 1).astype(np.uint8), rows - paeth))
+    cost = np.abs(cands.view(np.int8).astype(np.int16)).sum(axis=2, dtype=np.int64)
+    choice = cost.argmin(axis=0)
+    out = np.empty((n, stride + 1), np.uint8)
+    out[:, 0] = choice
+    out[:, 1:] = cands[choice, np.arange(n)]
+    return out
+
+def _png_block(raw: bytes, stride: int, bpp: int, skip: int, first: bool, last: bool, level: int):
+    # Pool worker. raw holds the block's rows after `skip` rows of context:
+    # the row above the block and, filtered, the tail of the previous block
+    # as deflate dictionary. Returns (deflated, adler32, filtered length).
+    rows = np.frombuffer(raw, np.uint8).reshape(-1, stride)
+    if first:
+        prev = np.zeros(stride, np.uint8)
+    else:
+        prev, rows, skip = rows[0], rows[1:], skip - 1
+    filtered = _png_filter(rows, prev, bpp)
+    zdict = filtered[:skip].tobytes()[-32768:]
+    data = filtered[skip:].tobytes()
+    return _deflate_block(data, zdict, last, level), zlib.adler32(data), len(data)
+
+def write_png_parallel(img: Image.Image, out, level: int = 6, threads: int = None):
+    # out: path or binary file object. Only PNG_MODES images; the ICC
+    # profile and simple transparency are kept, as Pillow's save does.
+    if np is None:
+        raise ValueError("The parallel PNG writer needs numpy.")
+    if img.mode not in PNG_MODES:
+        raise ValueError(f"The parallel PNG writer cannot store {img.mode} images.")
+    colour, depth, rawmode = PNG_MODES[img.mode]
+    w, h = img.size
+    bpp = LSB_MODES[img.mode] * depth // 8
+    stride = w * bpp
+    rows_per_block = max(1, CHUNK_SIZE // stride)
+    context = -(-32768 // (stride + 1))  # rows that fill the deflate window
+    threads = threads or os.cpu_count() or 1
+    pool = concurrent.futures.ThreadPoolExecutor(threads) if threads > 1 else None
+
+    header = [PNG_SIGNATURE, _png_chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, depth, colour, 0, 0, 0))]
+    icc = img.info.get("icc_profile")
+    if icc:
+        header.append(_png_chunk(b"iCCP", b"ICC Profile\0\0" + zlib.compress(icc)))
+    trns = img.info.get("transparency")
+    if colour in (0, 2) and trns is not None:
+        values = trns if isinstance(trns, tuple) else (trns,)
+        header.append(_png_chunk(b"tRNS", struct.pack(f">{len(values)}H", *values)))
+    # zlib header: deflate with a 32 KiB window, FLEVEL from the level, FCHECK
+    flg = (0 if level < 2 else 1 if level < 6 else 2 if level == 6 else 3) << 6
+    prefix = bytes((0x78, flg + 31 - (0x7800 + flg) % 31))
+    adler = 1
+    pending = collections.deque()
+
+    def drain(keep):
+        nonlocal adler, prefix
+        while len(pending) > keep:
+            piece, block_adler, length = pending.popleft().result()
+            f.write(_png_chunk(b"IDAT", prefix + piece))
+            adler, prefix = _adler32_combine(adler, block_adler, length), b""
+
+    f = open(out, "wb") if isinstance(out, (str, os.PathLike)) else out
+    try:
+        f.write(b"".join(header))
+        for y0 in range(0, h, rows_per_block):
+            y1 = min(h, y0 + rows_per_block)
+            y_ctx = max(0, y0 - context - 1)
+            raw = img.crop((0, y_ctx, w, y1)).tobytes("raw", rawmode)
+            pending.append(_submit(pool, _png_block, raw, stride, bpp, y0 - y_ctx,
+                                   y0 == 0, y1 == h, level))
+            drain(threads * 2)
+        drain(0)
+        f.write(_png_chunk(b"IDAT", struct.pack(">I", adler)) + _png_chunk(b"IEND", b""))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if f is not out:
+            f.close()
+
 # ---------- LSB core ----------
-def lsb_capacity(img: Image.Image) -> int:
-    # capacity in bits: num_pixels * channels (use RGB 3 channels) * 1 bit
+# Layout: the header takes the lowest bit of the first samples (every
+# channel of every pixel, row-major); a v2 body follows at `bits` low bits
+# per sample, MSB first, so depth 1 is the classic one-bit plane.
+# Images in LSB_MODES are used as they are (alpha and 16-bit samples
+# included); any other mode is converted first, see _lsb_mode.
+LSB_MODES = {"RGB": 3, "RGBA": 4, "L": 1, "LA": 2, "I;16": 1, "I;16B": 1}
+
+def _lsb_mode(img: Image.Image) -> str:
+    if img.mode in LSB_MODES:
+        return img.mode
+    return "RGBA" if img.has_transparency_data else "RGB"
+
+def lsb_capacity(img: Image.Image, bits: int = 1) -> int:
+    # capacity in bits: num_pixels * channels of the LSB mode * bits per sample
     w, h = img.size
-    return w * h * 3
+    return w * h * LSB_MODES[_lsb_mode(img)] * bits
 
-def lsb_embed(cover_path: str, payload: bytes, out_path: str, password: str = None):
-    img = Image.open(cover_path).convert("RGB")
+def _sample_array(img: Image.Image):
+    # flat, mutable samples for the pure-Python paths; 16-bit modes become
+    # an array of native-order unsigned shorts
+    data = img.tobytes()
+    if not img.mode.startswith("I;16"):
+        return bytearray(data)
+    samples = array.array("H", data)
+    if (img.mode == "I;16B") != (sys.byteorder == "big"):
+        samples.byteswap()
+    return samples
+
+def _sample_bytes(img: Image.Image, samples) -> bytes:
+    if isinstance(samples, bytearray):
+        return bytes(samples)
+    samples = array.array("H", samples)
+    if (img.mode == "I;16B") != (sys.byteorder == "big"):
+        samples.byteswap()
+    return samples.tobytes()
+
+def _lsb_embed_python(img: Image.Image, parts):
+    # parts: (data, bits) pieces written back to back from the first sample
+    samples = _sample_array(img)
+    pos = 0
+    for data, bits in parts:
+        keep = ~((1 << bits) - 1)
+        bitstream = bytes_to_bits(data)
+        for bit in bitstream:
+            value = bit
+            for _ in range(bits - 1):
+                value = (value << 1) | next(bitstream, 0)
+            samples[pos] = (samples[pos] & keep) | value
+            pos += 1
+    img.frombytes(_sample_bytes(img, samples))
+
+def _pack_samples(data: bytes, bits: int, v0: int = 0, v1: int = None):
+    # sample values v0..v1 of data's bits (MSB first) cut `bits` wide, zero
+    # padded at the end; only the bytes behind that range are unpacked
+    if v1 is None:
+        v1 = -(-len(data) * 8 // bits)
+    b0, b1 = v0 * bits // 8, -(-v1 * bits // 8)
+    stream = np.unpackbits(np.frombuffer(memoryview(data)[b0:b1], dtype=np.uint8))
+    skip = v0 * bits - b0 * 8
+    stream = stream[skip:skip + (v1 - v0) * bits]
+    if stream.size < (v1 - v0) * bits:
+        stream = np.concatenate([stream, np.zeros((v1 - v0) * bits - stream.size, dtype=np.uint8)])
+    if bits == 1:
+        return stream
+    return np.packbits(stream.reshape(-1, bits), axis=1).reshape(-1) >> (8 - bits)
+
+def _lsb_embed_numpy(img: Image.Image, parts):
+    # Same layout as the Python loop, the rest of the samples untouched.
+    samples = np.array(img).reshape(-1)  # uint8, or uint16 for I;16 modes
+    pos = 0
+    for data, bits in parts:
+        values = _pack_samples(data, bits)
+        n = values.size
+        samples[pos:pos + n] &= samples.dtype.type(~((1 << bits) - 1) & np.iinfo(samples.dtype).max)
+        samples[pos:pos + n] |= values
+        pos += n
+    img.frombytes(samples.tobytes())
+
+def _lsb_embed_bands(img: Image.Image, parts, max_memory: int) -> tuple:
+    # Same result as _lsb_embed_numpy, one strip of rows at a time: only the
+    # strip's samples and the payload bits that land in it are ever held
+    # as arrays, so working memory stays near max_memory bytes whatever
+    # the image or payload size. Returns (strips, rows per strip).
     w, h = img.size
-    px = img.load()
+    row = w * LSB_MODES[img.mode]
+    itemsize = 2 if img.mode.startswith("I;16") else 1
+    # strip copy + its tobytes() + ~2 bytes of bit scratch per sample
+    rows = max(1, max_memory // (row * (2 * itemsize + 2)))
+    segments, end = [], 0
+    for data, bits in parts:
+        n = -(-len(data) * 8 // bits)
+        segments.append((end, end + n, data, bits))
+        end += n
+    strips = 0
+    for y0 in range(0, min(h, -(-end // row)), rows):
+        y1 = min(h, y0 + rows)
+        s0, s1 = y0 * row, y1 * row
+        band = np.array(img.crop((0, y0, w, y1))).reshape(-1)
+        for a, b, data, bits in segments:
+            lo, hi = max(a, s0), min(b, s1)
+            if lo < hi:
+                keep = band.dtype.type(~((1 << bits) - 1) & np.iinfo(band.dtype).max)
+                band[lo - s0:hi - s0] &= keep
+                band[lo - s0:hi - s0] |= _pack_samples(data, bits, lo - a, hi - a)
+        img.paste(Image.frombuffer(img.mode, (w, y1 - y0), band.tobytes(), "raw", img.mode, 0, 1), (0, y0))
+        strips += 1
+    return strips, rows
+
+def _peak_rss():
+    # peak resident set size of this process in bytes, where the OS says;
+    # Linux's VmHWM restarts at exec, ru_maxrss would carry the parent's
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
 
-    # Build payload: MAGIC | VERSION | enc_flag(1) | total_len(4) | data
-    if password:
-        data = encrypt_payload(password, payload)
-        enc_flag = b"\x01"
+@_staged("lsb_embed")
+def lsb_embed(cover_path: str, payload, out_path: str, password: str = None,
+              session: CryptoSession = None, kdf: KdfParams = None, version: int = VERSION,
+              bits: int = 1, max_memory: int = None, stats: dict = None,
+              profile: str = DEFAULT_PROFILE, png_threads: int = None):
+    # max_memory (bytes) switches to strip-by-strip embedding, which gives
+    # the same output; stats, when given, receives strips, strip_rows and
+    # peak_rss. profile picks the encoder settings (see ENCODER_PROFILES),
+    # png_threads the multi-threaded PNG writer (see save_stego).
+    if not 1 <= bits <= LSB_MAX_BITS:
+        raise ValueError(f"LSB depth must be 1-{LSB_MAX_BITS} bits per channel.")
+    if version == 1 and bits != 1:
+        raise ValueError("Format 1 only supports 1 bit per channel.")
+    if version == 1 and password and kdf not in (None, DEFAULT_KDF):
+        raise ValueError(f"Format 1 always uses {format_kdf(DEFAULT_KDF)}; use format 2 for --kdf.")
+    with _stage("decode"):
+        img = _lsb_open_cover(cover_path)
+        img.load()
+    # A streamed payload is buffered, but never past what the image can hold.
+    payload = _read_payload(payload, lsb_capacity(img, bits) // 8)
+
+    if version == 1:
+        # MAGIC | VERSION | enc_flag(1) | total_len(4) | data
+        if password:
+            data = _encrypt_legacy(password, payload, session)
+            enc_flag = b"\x01"
+        else:
+            data = payload
+            enc_flag = b"\x00"
+        header = LSB_MAGIC + struct.pack("<I", 1) + enc_flag + struct.pack("<I", len(data))
     else:
-        data = payload
-        enc_flag = b"\x00"
+        # MAGIC | VERSION | bits(1) | body_len(8) | container body
+        body = io.BytesIO()
+        write_container(body, payload, password, session, kdf)
+        data = body.getvalue()
+        header = LSB_MAGIC + struct.pack("<IBQ", version, bits, len(data))
+
+    _lsb_write(img, header, data, out_path, bits, max_memory, stats, profile, png_threads)
+
+def _lsb_open_cover(cover_path: str) -> Image.Image:
+    img = Image.open(cover_path)
+    mode = _lsb_mode(img)
+    # Native modes are embedded in place, without an image-sized converted copy.
+    return img.convert(mode) if img.mode != mode else img
+
+def _lsb_body_capacity(img: Image.Image, bits: int) -> int:
+    # bytes of v2 body that fit after the (one bit per sample) header
+    return (lsb_capacity(img, bits) - LSB_V2_HEADER_LEN * 8 * bits) // 8
 
-    header = LSB_MAGIC + struct.pack("<I", VERSION) + enc_flag + struct.pack("<I", len(data))
-    blob = header + data
+def _encoder_options(img: Image.Image, out_path: str, profile: str):
+    # (format, save options) for a stego image; refuses lossy combinations
+    if profile not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile '{profile}' (use {', '.join(ENCODER_PROFILES)}).")
+    fmt = STEGO_FORMATS.get(os.path.splitext(str(out_path))[1].lower(), "PNG")
+    if fmt == "BMP" and img.mode not in BMP_MODES:
+        raise ValueError(f"BMP cannot store {img.mode} images losslessly; save as .png or .tiff.")
+    return fmt, ENCODER_PROFILES[profile][fmt]
+
+def _png_level(options: dict) -> int:
+    # zlib level Pillow uses for these PNG save options
+    return options.get("compress_level", 9 if options.get("optimize") else 6)
+
+def save_stego(img: Image.Image, out_path, profile: str = DEFAULT_PROFILE, png_threads: int = None):
+    # out_path may also be a file object, which is written as PNG.
+    # png_threads (0 = all cores) uses write_png_parallel for PNG output.
+    fmt, options = _encoder_options(img, out_path, profile)
+    raw_size = img.size[0] * img.size[1] * len(img.getbands()) * (2 if img.mode.startswith("I;16") else 1)
+    with _stage("encode", raw_size):
+        if fmt == "PNG" and png_threads is not None and np is not None and img.mode in PNG_MODES:
+            write_png_parallel(img, out_path, _png_level(options), png_threads)
+        else:
+            img.save(out_path, format=fmt, **options)
+
+def _lsb_embed_pixels(img: Image.Image, parts: list, max_memory: int = None):
+    # embeds (data, bits) parts in place; returns (strips, strip_rows)
+    if np is not None and max_memory:
+        return _lsb_embed_bands(img, parts, max_memory)
+    if np is not None:
+        _lsb_embed_numpy(img, parts)
+    else:
+        _lsb_embed_python(img, parts)
+    return 1, img.size[1]
 
-    required_bits = len(blob) * 8
-    cap = lsb_capacity(img)
+def _lsb_write(img: Image.Image, header: bytes, data: bytes, out_path: str, bits: int,
+               max_memory: int = None, stats: dict = None, profile: str = DEFAULT_PROFILE,
+               png_threads: int = None):
+    # the header always sits at one bit per sample
+    required_bits = len(header) * 8 * bits + len(data) * 8
+    cap = lsb_capacity(img, bits)
     if required_bits > cap:
         raise ValueError(f"Payload too large for this image. Need {required_bits} bits, have {cap} bits.")
+    _encoder_options(img, out_path, profile)  # fail before the pixel work
 
-    bitstream = bytes_to_bits(blob)
-    # Write across pixels row-major
-    for y in range(h):
-        for x in range(w):
-            r, g, b = px[x, y]
-            try:
-                r = (r & 0xFE) | next(bitstream)
-                g = (g & 0xFE) | next(bitstream)
-                b = (b & 0xFE) | next(bitstream)
-            except StopIteration:
-                px[x, y] = (r, g, b)
-                img.save(out_path, format="PNG")
-                return
-            px[x, y] = (r, g, b)
+    parts = [(header + data, 1)] if bits == 1 else [(header, 1), (data, bits)]
+    with _stage("embed", len(header) + len(data)):
+        strips, rows = _lsb_embed_pixels(img, parts, max_memory)
+    save_stego(img, out_path, profile, png_threads)
+    if stats is not None:
+        stats.update(strips=strips, strip_rows=rows, peak_rss=_peak_rss())
 
-    img.save(out_path, format="PNG")
+def _decode_top(img: Image.Image, rows: int):
+    # Decodes only the first `rows` rows of a not yet loaded PNG, BMP or
+    # TIFF by trimming its decoder tiles: PNG rows are one zlib stream in
+    # order, raw strips can be seeked to (BMP stores them bottom-up).
+    # Returns None when the file cannot be cut that way (interlaced PNG,
+    # compressed TIFF, other formats); the caller then decodes it whole.
+    if (img.format not in ("PNG", "BMP", "TIFF") or not getattr(img, "filename", None)
+            or img.info.get("interlace")):
+        return None
+    with Image.open(img.filename) as part:
+        w, h = part.size
+        tiles = []
+        for name, (x0, y0, x1, y1), offset, args in part.tile:
+            if y0 >= rows:
+                continue
+            if x0 != 0 or x1 != w:
+                return None
+            cut = min(y1, rows)
+            if name == "zip" and part.format == "PNG" and (y0, y1) == (0, h):
+                tiles.append((name, (0, 0, w, cut), offset, args))
+            elif name == "raw":
+                args = tuple(args) if isinstance(args, tuple) else (args,)
+                rawmode, stride, orientation = (args + (0, 1))[:3]
+                if orientation < 0:
+                    if not stride:
+                        return None
+                    offset += (y1 - cut) * stride
+                tiles.append((name, (0, y0, w, cut), offset, (rawmode, stride, orientation)))
+            else:
+                return None
+        part._size = (w, min(rows, h))
+        part.tile = tiles
+        part.load()
+        # a detached copy of just those rows (TIFF allocates the full height),
+        # so the file, which TIFF keeps open after load, can be closed
+        return part.crop((0, 0, w, min(rows, h)))
 
-def lsb_extract(stego_path: str, out_zip: str, password: str = None):
-    img = Image.open(stego_path).convert("RGB")
-    w, h = img.size
-    px = img.load()
+def _lsb_bit_reader(img: Image.Image):
+    # read(start, nbytes, bits=1, base=0): nbytes from the bit stream made of
+    # the `bits` low bits (MSB first) of each sample from sample index
+    # `base` on, beginning `start` bits into that stream. Samples are the
+    # channels of the image's LSB mode per pixel, row-major; with the
+    # defaults `start` is a sample index.
+    # Mode conversion is per pixel, so converting only the rows that are
+    # read gives the same samples as converting the whole image first.
+    mode = _lsb_mode(img)
+    channels = LSB_MODES[mode]
+    total = img.size[0] * img.size[1] * channels
+
+    def span(start, nbytes, bits, base):
+        s0 = base + start // bits
+        s1 = base + -(-(start + nbytes * 8) // bits)
+        if s1 > total:
+            raise ValueError("Corrupt LSB payload (length exceeds image capacity).")
+        return s0, s1, start % bits
 
-    # Read bits into bytes progressively, first enough to parse header
-    # Header lengths:
-    # LSB_MAGIC(len) + 4(version) + 1(enc_flag) + 4(total_len)
-    header_len = len(LSB_MAGIC) + 4 + 1 + 4
-    header_bits = header_len * 8
+    if np is not None:
+        w, h = img.size
+        row = w * channels
+        top = [None]
 
-    def pixel_bits():
-        for y in range(h):
-            for x in range(w):
-                r, g, b = px[x, y]
-                yield r & 1
-                yield g & 1
-                yield b & 1
+        def rows_upto(y1):
+            # Header-first: while reads stay in the upper half of a file
+            # that is not loaded yet, decode only a growing top part of it.
+            if top[0] is not None and top[0].size[1] >= y1:
+                return top[0]
+            if getattr(img, "tile", None) and y1 * 2 < h:
+                rows = max(y1, 2 * (top[0].size[1] if top[0] is not None else 0), 16)
+                try:
+                    top[0] = _decode_top(img, rows)
+                except Exception:  # private decoder hooks; fall back to a full decode
+                    top[0] = None
+                if top[0] is not None:
+                    return top[0]
+            return img
 
-    gen = pixel_bits()
-    header_bytes = bits_to_bytes(gen, header_bits)
+        def read(start: int, nbytes: int, bits: int = 1, base: int = 0) -> bytes:
+            s0, s1, skip = span(start, nbytes, bits, base)
+            # Only decode the rows that hold the requested bits.
+            y0, y1 = s0 // row, -(-s1 // row)
+            band = rows_upto(y1).crop((0, y0, w, y1))
+            if band.mode != mode:
+                band = band.convert(mode)
+            band = np.asarray(band).reshape(-1)[s0 - y0 * row:s1 - y0 * row]
+            low = (band & ((1 << bits) - 1)).astype(np.uint8)
+            if bits == 1:
+                plane = low
+            else:
+                plane = np.unpackbits(low[:, None], axis=1)[:, 8 - bits:].reshape(-1)
+            return np.packbits(plane[skip:skip + nbytes * 8]).tobytes()
+    else:
+        samples = _sample_array(img if img.mode == mode else img.convert(mode))
+
+        def sample_bits(s0, bits):
+            for i in range(s0, total):
+                value = samples[i]
+                for k in range(bits - 1, -1, -1):
+                    yield (value >> k) & 1
 
-    if not header_bytes.startswith(LSB_MAGIC):
-        raise ValueError("No LSB payload found (magic mismatch).")
+        def read(start: int, nbytes: int, bits: int = 1, base: int = 0) -> bytes:
+            s0, _, skip = span(start, nbytes, bits, base)
+            stream = sample_bits(s0, bits)
+            for _ in range(skip):
+                next(stream)
+            return bits_to_bytes(stream, nbytes * 8)
+    return read
 
+def _parse_lsb_header(header_bytes: bytes):
+    # v1 header = LSB_MAGIC + u32 version + enc_flag(1) + u32 total_len
     offset = len(LSB_MAGIC)
     version = struct.unpack("<I", header_bytes[offset:offset+4])[0]
     offset += 4
     enc_flag = header_bytes[offset]
     offset += 1
     total_len = struct.unpack("<I", header_bytes[offset:offset+4])[0]
-    offset += 4
+    return version, enc_flag, total_len
+
+def _lsb_body_reader(read, header_len: int, bits: int = 1):
+    # read_at(offset, n) over the bytes that follow the header
+    def read_at(offset: int, n: int) -> bytes:
+        return read(offset * 8, n, bits, header_len * 8)
+    return read_at
 
-    data_bits = total_len * 8
-    data_bytes = bits_to_bytes(gen, data_bits)
+def read_lsb_header(img: Image.Image):
+    # Returns (version, enc_flag, total_len, read_at) for an LSB carrier, or
+    # None when the magic is absent. read_at(offset, n) reads the total_len
+    # bytes after the header (the v2 container body, or the v1 data). For
+    # v2, enc_flag comes from the body's encryption descriptor.
+    if lsb_capacity(img) < LSB_HEADER_LEN * 8:
+        return None
+    read = _lsb_bit_reader(img)
+    # The magic alone spans the first 32 pixels; reject non-carriers there.
+    if read(0, len(LSB_MAGIC)) != LSB_MAGIC:
+        return None
+    version, enc_flag, total_len = _parse_lsb_header(read(0, LSB_HEADER_LEN))
+    if version == 1:
+        return version, enc_flag, total_len, _lsb_body_reader(read, LSB_HEADER_LEN)
+    if version != 2:
+        raise ValueError(f"Unsupported LSB format version {version}.")
+    _, bits, total_len = struct.unpack("<IBQ", read(len(LSB_MAGIC) * 8, LSB_V2_HEADER_LEN - len(LSB_MAGIC)))
+    if not 1 <= bits <= LSB_MAX_BITS:
+        raise ValueError(f"Unsupported LSB depth {bits}.")
+    read_at = _lsb_body_reader(read, LSB_V2_HEADER_LEN, bits)
+    return version, read_at(1, 1)[0], total_len, read_at
 
-    if enc_flag == 1:
-        if not password:
+@_staged("lsb_extract")
+def lsb_extract(stego_path: str, out_zip: str, password: str = None,
+                session: CryptoSession = None):
+    with Image.open(stego_path) as img:
+        with _stage("header"):
+            header = read_lsb_header(img)
+        if header is None:
+            raise ValueError("No LSB payload found (magic mismatch).")
+        version, enc_flag, total_len, read_at = header
+        if version == 2:
+            if enc_flag and not password:
+                raise ValueError("Password required to decrypt.")
+            with _output_file(out_zip) as f:
+                extract_container(read_at, total_len, f, password, session)
+            return
+        if enc_flag == 1 and not password:
             raise ValueError("Password required to decrypt.")
-        data = decrypt_payload(password, data_bytes)
-    else:
-        data = data_bytes
+        with _stage("unpack", total_len):
+            data_bytes = read_at(0, total_len)
+            if enc_flag == 1:
+                data = decrypt_payload(password, data_bytes, session)
+            else:
+                data = data_bytes
 
-    with open(out_zip, "wb") as f:
+    with _output_file(out_zip) as f:
         f.write(data)
 
+def open_lsb_payload(stego_path: str, password: str = None,
+                     session: CryptoSession = None) -> io.RawIOBase:
+    # Seekable file object over an LSB payload. Each read decodes only the
+    # image rows holding the requested bytes (see _lsb_bit_reader), so
+    # zipfile can list or extract one member without rebuilding the blob.
+    img = Image.open(stego_path)
+    try:
+        header = read_lsb_header(img)
+        if header is None:
+            raise ValueError("No LSB payload found (magic mismatch).")
+        version, enc_flag, total_len, read_at = header
+        if version == 2:
+            return _container_payload_file(read_at, total_len, password, session, img.close)
+        if enc_flag == 1:
+            raise ValueError("Encrypted format 1 payloads cannot be read lazily; use lsb_extract.")
+        return _raw_payload_file(read_at, total_len, img.close)
+    except BaseException:
+        img.close()
+        raise
+
+def open_payload(stego_path: str, password: str = None, session: CryptoSession = None) -> io.RawIOBase:
+    # open_append_payload or open_lsb_payload, whichever carrier probe()
+    # reports first
+    carriers = probe(stego_path)
+    if not carriers:
+        raise ValueError("No hidden data found.")
+    if carriers[0]["method"] == "append":
+        return open_append_payload(stego_path, password, session)
+    return open_lsb_payload(stego_path, password, session)
+
+# ---------- Probe ----------
+def _lossy_image(img: Image.Image, path: str) -> bool:
+    # JPEG and lossy WebP cannot carry LSB data (their decoders never give
+    # back the encoded samples), so probe skips their full decode. A WebP is
+    # lossy when its first image chunk is "VP8 " rather than "VP8L".
+    if img.format in ("JPEG", "MPO"):
+        return True
+    if img.format != "WEBP":
+        return False
+    with open(path, "rb") as f:
+        f.seek(12)  # RIFF, size, WEBP
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return False
+            tag, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if tag in (b"VP8 ", b"VP8L"):
+                return tag == b"VP8 "
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+def probe(path: str) -> list:
+    # Describes every carrier in path without extracting anything: the
+    # append footer costs one tail read, the LSB header the first image
+    # rows (lossy JPEG/WebP are not decoded at all). Returns a list of {"method", "version", "size", "encrypted"},
+    # append first; an empty list means no hidden data.
+    found = []
+    with open(path, "rb") as f:
+        try:
+            version, start, length = read_append_footer(f)
+            encrypted = False
+            if version == 2:
+                encrypted = parse_container(_file_read_at(f, start), length).enc != ENC_NONE
+        except ValueError:
+            pass
+        else:
+            found.append({"method": "append", "version": version, "size": length, "encrypted": encrypted})
+    try:
+        img = Image.open(path)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return found  # not an image Pillow can read
+    with img:
+        header = None if _lossy_image(img, path) else read_lsb_header(img)
+    if header is not None:
+        version, enc_flag, total_len, read_at = header
+        hit = {"method": "lsb", "version": version, "size": total_len, "encrypted": enc_flag == 1}
+        if version == 2 and read_at(0, 1)[0] == CODEC_SHARD:
+            shard = _parse_shard_header(read_at(0, SHARD_HEADER.size))
+            hit["shard"] = f"{shard['index'] + 1}/{shard['count']}"
+            hit["set"] = shard["set"]
+        found.append(hit)
+    return found
+
+# ---------- Shards ----------
+# A payload too big for one cover is written as one v2 body (see
+# Container v2) cut into slices, one per cover. Each cover's LSB body is
+#   codec(1)=CODEC_SHARD | enc(1) | set_id(16) | index(u32) | count(u32)
+#   | total_len(u64) | offset(u64) | crc32(u32) | slice
+# and the slices of one set_id, joined by offset, give back the full body.
+SHARD_HEADER = struct.Struct("<BB16sIIQQI")
+
+def _parse_shard_header(raw: bytes) -> dict:
+    codec, enc, set_id, index, count, total_len, offset, crc = SHARD_HEADER.unpack(raw)
+    if codec != CODEC_SHARD or not index < count:
+        raise ValueError("Corrupt shard header.")
+    return {"enc": enc, "set": set_id.hex(), "index": index, "count": count,
+            "total_len": total_len, "offset": offset, "crc": crc}
+
+def _embed_shard(cover_path: str, shard: bytes, out_path: str, bits: int,
+                 profile: str = DEFAULT_PROFILE) -> str:
+    # Pool worker: write one shard body into one cover.
+    img = _lsb_open_cover(cover_path)
+    header = LSB_MAGIC + struct.pack("<IBQ", 2, bits, len(shard))
+    _lsb_write(img, header, shard, out_path, bits, profile=profile)
+    return out_path
+
+def _read_shard(path: str):
+    # Pool worker: returns (shard header dict, slice bytes) of one cover.
+    with Image.open(path) as img:
+        header = read_lsb_header(img)
+        if header is None:
+            raise ValueError(f"{path}: no LSB payload found.")
+        version, _, total_len, read_at = header
+        if version != 2 or total_len < SHARD_HEADER.size or read_at(0, 1)[0] != CODEC_SHARD:
+            raise ValueError(f"{path}: not a shard of a multi-cover payload.")
+        info = _parse_shard_header(read_at(0, SHARD_HEADER.size))
+        data = read_at(SHARD_HEADER.size, total_len - SHARD_HEADER.size)
+    if zlib.crc32(data) != info["crc"]:
+        raise ValueError(f"{path}: shard {info['index'] + 1} fails its checksum.")
+    return info, data
+
+def lsb_embed_shards(cover_paths: list, payload, out_paths: list, password: str = None,
+                     session: CryptoSession = None, kdf: KdfParams = None, bits: int = 1,
+                     workers: int = None, profile: str = DEFAULT_PROFILE) -> list:
+    # Spreads one payload over the covers in proportion to their capacity
+    # and embeds the shards in parallel. Returns the output paths written.
+    if len(cover_paths) != len(out_paths) or not cover_paths:
+        raise ValueError("Provide one output path per cover.")
+    if not 1 <= bits <= LSB_MAX_BITS:
+        raise ValueError(f"LSB depth must be 1-{LSB_MAX_BITS} bits per channel.")
+    if profile not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile '{profile}' (use {', '.join(ENCODER_PROFILES)}).")
+    caps = []
+    for path in cover_paths:
+        with Image.open(path) as img:  # header only; pixels are decoded by the workers
+            caps.append(max(0, _lsb_body_capacity(img, bits) - SHARD_HEADER.size))
+    body = io.BytesIO()
+    write_container(body, _read_payload(payload, sum(caps)), password, session, kdf)
+    body = body.getvalue()
+    if len(body) > sum(caps):
+        raise ValueError(f"Payload too large for these covers. Need {len(body)} bytes, have {sum(caps)} bytes.")
+
+    set_id = secrets.token_bytes(16)
+    enc = body[1]
+    shards, offset, room = [], 0, sum(caps)
+    for cap in caps:
+        # share what is left in proportion to the capacity that is left
+        size = min(cap, -(-(len(body) - offset) * cap // room)) if room else 0
+        room -= cap
+        piece = body[offset:offset + size]
+        shards.append(SHARD_HEADER.pack(CODEC_SHARD, enc, set_id, len(shards), len(caps),
+                                        len(body), offset, zlib.crc32(piece)) + piece)
+        offset += size
+    with concurrent.futures.ProcessPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        return list(pool.map(_embed_shard, cover_paths, shards, out_paths, [bits] * len(shards),
+                             [profile] * len(shards)))
+
+def lsb_extract_shards(stego_paths: list, out_zip: str, password: str = None,
+                       session: CryptoSession = None, workers: int = None):
+    # Reads the shards in parallel, in any order, checks that they form one
+    # complete set and extracts the reassembled payload.
+    with concurrent.futures.ProcessPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        shards = list(pool.map(_read_shard, stego_paths))
+    sets = {info["set"] for info, _ in shards}
+    if len(sets) != 1:
+        raise ValueError(f"Covers belong to {len(sets)} different shard sets.")
+    shards.sort(key=lambda shard: shard[0]["index"])
+    count, total_len = shards[0][0]["count"], shards[0][0]["total_len"]
+    indices = [info["index"] for info, _ in shards]
+    if indices != list(range(count)):
+        missing = sorted(set(range(count)) - set(indices))
+        if missing:
+            raise ValueError(f"Missing shards {', '.join(str(i + 1) for i in missing)} of {count}.")
+        raise ValueError("Duplicate shards given.")
+    offset = 0
+    for info, data in shards:
+        if info["offset"] != offset or info["total_len"] != total_len:
+            raise ValueError("Corrupt shard set (slices do not line up).")
+        offset += len(data)
+    if offset != total_len:
+        raise ValueError("Corrupt shard set (slices do not line up).")
+    if shards[0][0]["enc"] and not password:
+        raise ValueError("Password required to decrypt.")
+    body = b"".join(data for _, data in shards)
+    with _output_file(out_zip) as f:
+        extract_container(lambda o, n: body[o:o + n], len(body), f, password, session)
+
+# ---------- Batch ----------
+BATCH_FIELDS = ("cover", "payload", "out", "method")
+SUMMARY_FIELDS = ("job",) + BATCH_FIELDS + ("status", "error", "seconds", "bytes")
+
+def load_jobs(path: str, method: str = "append") -> list:
+    # CSV with a header row, or JSONL (.jsonl/.json), one job per row/line
+    # with the BATCH_FIELDS keys. "payload" is a folder or a ZIP file.
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith((".jsonl", ".json")):
+            jobs = [json.loads(line) for line in f if line.strip()]
+        else:
+            jobs = list(csv.DictReader(f))
+    for i, job in enumerate(jobs, 1):
+        missing = [k for k in ("cover", "payload", "out") if not job.get(k)]
+        if missing:
+            raise ValueError(f"{path}: job {i} is missing {', '.join(missing)}.")
+        job["method"] = (job.get("method") or method).lower()
+    return jobs
+
+def pair_jobs(covers_dir: str, payloads_dir: str, out_dir: str, method: str = "append") -> list:
+    # Pairs covers/<stem>.<ext> with payloads/<stem>/ or payloads/<stem>.zip;
+    # LSB outputs are always written as <stem>.png.
+    jobs = []
+    for name in sorted(os.listdir(covers_dir)):
+        cover = os.path.join(covers_dir, name)
+        if not os.path.isfile(cover):
+            continue
+        stem, ext = os.path.splitext(name)
+        payload = os.path.join(payloads_dir, stem)
+        if not os.path.isdir(payload):
+            payload += ".zip"
+        out = os.path.join(out_dir, stem + (".png" if method == "lsb" else ext))
+        jobs.append({"cover": cover, "payload": payload, "out": out, "method": method})
+    return jobs
+
+_batch_password = None
+_batch_session = None
+_batch_stages = None  # stage events of the current job, when timing
+
+def _batch_init(password, reuse_salt: bool = False, kdf: KdfParams = None, stages: bool = False):
+    # Pool initializer: one password and one key cache per worker process.
+    global _batch_password, _batch_session, _batch_stages
+    _batch_password = password
+    _batch_session = CryptoSession(reuse_salt=reuse_salt, kdf=kdf)
+    if stages:
+        _batch_stages = []
+        add_stage_observer(_batch_stages.append)
+
+def _run_embed_job(job: dict) -> dict:
+    # Runs in a pool worker and never raises, so one bad job cannot stop
+    # the batch. Folder payloads are zipped on one thread: the pool
+    # already keeps every core busy.
+    t0 = time.perf_counter()
+    result = {k: job.get(k) for k in ("job",) + BATCH_FIELDS}
+    if _batch_stages is not None:
+        del _batch_stages[:]
+    try:
+        src = job["payload"]
+        if os.path.isdir(src):
+            payload = stream_payload(input_folder=src, workers=1)
+        else:
+            payload = stream_payload(input_zip=src)
+        os.makedirs(os.path.dirname(job["out"]) or ".", exist_ok=True)
+        if job["method"] == "append":
+            append_embed(job["cover"], payload, job["out"], password=_batch_password,
+                         session=_batch_session)
+        elif job["method"] == "lsb":
+            lsb_embed(job["cover"], payload, job["out"], password=_batch_password,
+                      session=_batch_session)
+        else:
+            raise ValueError(f"Unknown method {job['method']!r}.")
+        result.update(status="ok", error="", bytes=os.path.getsize(job["out"]))
+    except Exception as e:
+        result.update(status="error", error=str(e) or type(e).__name__, bytes=0)
+    result["seconds"] = round(time.perf_counter() - t0, 4)
+    if _batch_stages is not None:
+        totals = collections.defaultdict(float)
+        for event in _batch_stages:
+            totals[event["stage"]] += event["seconds"]
+        result["stages"] = dict(totals)
+    return result
+
+def batch_embed(jobs: list, workers: int = None, password: str = None, reuse_salt: bool = False,
+                kdf: KdfParams = None, stages: bool = False):
+    # Yields one result dict per job (see SUMMARY_FIELDS) as jobs finish.
+    # With stages, results also carry {stage: seconds} for the job (for
+    # stage_percentiles); JSONL summaries keep it, CSV ones drop it.
+    workers = workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_batch_init, initargs=(password, reuse_salt, kdf, stages)) as pool:
+        futures = {}
+        for i, job in enumerate(jobs, 1):
+            job = dict(job, job=i)
+            futures[pool.submit(_run_embed_job, job)] = job
+        for fut in concurrent.futures.as_completed(futures):
+            try:
+                yield fut.result()
+            except Exception as e:  # worker process died (e.g. killed by the OOM killer)
+                job = futures[fut]
+                result = {k: job.get(k) for k in ("job",) + BATCH_FIELDS}
+                result.update(status="error", error=str(e) or type(e).__name__, seconds=0, bytes=0)
+                yield result
+
+def _open_summary(path: str):
+    # Returns (write(result), close()) for a .csv or JSONL summary file.
+    f = open(path, "w", newline="", encoding="utf-8")
+    if path.lower().endswith(".csv"):
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        return writer.writerow, f.close
+    return (lambda result: f.write(json.dumps(result) + "\n")), f.close
+
+# ---------- Scan ----------
+def _scan_out(out_dir: str, rel: str, method: str) -> str:
+    out = os.path.join(out_dir, rel + f".{method}.zip")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    return out
+
+def _scan_file(path: str, root: str, out_dir: str = None, password: str = None) -> list:
+    # Probes one file and extracts any hit into out_dir. Returns one record
+    # per hit; non-carriers return [].
+    rel = os.path.relpath(path, root)
+    try:
+        hits = probe(path)
+    except Exception as e:
+        return [{"path": path, "error": str(e) or type(e).__name__}]
+    for hit in hits:
+        hit["path"] = path
+        if not out_dir or (hit["encrypted"] and not password):
+            continue
+        out = _scan_out(out_dir, rel, hit["method"])
+        try:
+            if hit["method"] == "append":
+                append_extract(path, out, password=password, session=_batch_session)
+            else:
+                lsb_extract(path, out, password=password, session=_batch_session)
+            hit["out"] = out
+        except Exception as e:  # corrupt carrier or wrong password
+            hit["error"] = str(e) or type(e).__name__
+    return hits
+
+def scan_tree(root: str, out_dir: str = None, workers: int = None, password: str = None):
+    # Yields (path, hits) for every file under root, probing in parallel.
+    workers = workers or os.cpu_count() or 1
+    skip = os.path.abspath(out_dir) if out_dir else None
+    paths = []
+    for d, dirs, files in os.walk(root):
+        # never rescan our own extractions when out_dir sits inside root
+        dirs[:] = [x for x in dirs if os.path.abspath(os.path.join(d, x)) != skip]
+        paths.extend(os.path.join(d, name) for name in files)
+    chunksize = max(1, min(64, len(paths) // (workers * 8)))
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_batch_init, initargs=(password,)) as pool:
+        results = pool.map(_scan_file, paths, [root] * len(paths), [out_dir] * len(paths),
+                           [password] * len(paths), chunksize=chunksize)
+        for path, hits in zip(paths, results):
+            yield path, hits
+
+# ---------- Benchmarks ----------
+def synthetic_cover(megapixels: float, seed: int = 0) -> Image.Image:
+    # 4:3 RGB cover of smooth gradients plus sensor-like noise (+-25 around
+    # mid grey), so encoders see something closer to a photo than to white
+    # noise. The same size and seed always give the same pixels.
+    w = max(1, int((megapixels * 1e6 * 4 / 3) ** 0.5))
+    h = max(1, int(megapixels * 1e6 / w))
+    noise = random.Random(seed).getrandbits(8 * w * h).to_bytes(w * h, "little")
+    bands = (Image.linear_gradient("L").resize((w, h)),
+             Image.frombytes("L", (w, h), noise).point([128 + (v - 128) // 5 for v in range(256)]),
+             Image.radial_gradient("L").resize((w, h)))
+    return Image.merge("RGB", bands)
+
+def bench_encoders(img: Image.Image, fill: float = 0.5, profiles=None, png_threads: int = 0) -> list:
+    # Fills `fill` of the 1-bit LSB capacity with random bytes, then times
+    # every profile/format pair that can hold the image losslessly (pairs
+    # with identical options are timed once), plus write_png_parallel on
+    # png_threads threads for each PNG profile unless png_threads is None.
+    # Returns one dict per encode; "threads" is None for Pillow's encoders.
+    img = img.convert(_lsb_mode(img)) if img.mode != _lsb_mode(img) else img.copy()
+    _lsb_embed_pixels(img, [(os.urandom(int(lsb_capacity(img) * fill) // 8), 1)])
+    raw = img.tobytes()
+    runs, seen = [], set()
+    for profile in profiles or ENCODER_PROFILES:
+        for fmt, options in ENCODER_PROFILES[profile].items():
+            key = (fmt, tuple(sorted(options.items())))
+            if key in seen or (fmt == "BMP" and img.mode not in BMP_MODES):
+                continue
+            seen.add(key)
+            runs.append((profile, fmt, None, lambda f, fmt=fmt, options=options:
+                         img.save(f, format=fmt, **options)))
+            if fmt == "PNG" and png_threads is not None and np is not None and img.mode in PNG_MODES:
+                threads = png_threads or os.cpu_count() or 1
+                runs.append((profile, fmt, threads, lambda f, options=options, threads=threads:
+                             write_png_parallel(img, f, _png_level(options), threads)))
+    results = []
+    for profile, fmt, threads, encode in runs:
+        buf = io.BytesIO()
+        t0 = time.perf_counter()
+        encode(buf)
+        elapsed = time.perf_counter() - t0
+        buf.seek(0)
+        with Image.open(buf) as back:
+            lossless = back.mode == img.mode and back.tobytes() == raw
+        results.append({"profile": profile, "format": fmt, "threads": threads, "seconds": elapsed,
+                        "bytes": buf.getbuffer().nbytes, "raw_bytes": len(raw),
+                        "mb_per_s": len(raw) / elapsed / 1e6 if elapsed else None,
+                        "lossless": lossless})
+    return results
+
+BENCH_OPS = ("zip", "encrypt", "decrypt", "append_embed", "append_extract", "lsb_embed", "lsb_extract")
+
+def parse_size(spec: str) -> int:
+    # "512", "64K", "4M", "1G" (binary multiples)
+    spec = spec.strip().upper().rstrip("B")
+    scale = {"K": 2**10, "M": 2**20, "G": 2**30}.get(spec[-1:], 1)
+    try:
+        size = int(float(spec[:-1] if scale > 1 else spec) * scale)
+    except ValueError:
+        raise ValueError(f"Bad size '{spec}' (use e.g. 64K, 4M, 1G).") from None
+    if size <= 0:
+        raise ValueError(f"Bad size '{spec}' (must be positive).")
+    return size
+
+def synthetic_payload(folder: str, size: int, seed: int = 0):
+    # `size` bytes in files of up to 64 MiB: 2 KiB of pseudo-random bytes,
+    # then 2 KiB of repetitive text, over and over, so deflate halves it.
+    # The same size and seed always give the same files.
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    text = b"StegoBox synthetic payload 0123456789 abcdefghijklmnopqrstuvwxyz\n" * 32
+    left, n = size, 0
+    while left > 0:
+        part = min(left, 64 * 2**20)
+        with open(os.path.join(folder, f"part{n:04d}.bin"), "wb") as f:
+            for pos in range(0, part, CHUNK_SIZE):
+                k = min(CHUNK_SIZE, part - pos)
+                noise = rng.getrandbits(8 * (k // 2)).to_bytes(k // 2, "little") if k > 1 else b""
+                f.write(b"".join(noise[i:i + 2048] + text[:2048] for i in range(0, k // 2, 2048))[:k])
+        left -= part
+        n += 1
+
+def _bench_op(op: str, cover: str, folder: str, payload: str, out: str, password: str, repeat: int):
+    # Pool worker, run in a fresh process per operation so that peak_rss
+    # is this operation's (plus the interpreter and its inputs). Returns
+    # (best seconds of `repeat` runs, peak RSS).
+    if op == "zip":
+        run = lambda: zip_folder_to_bytes(folder)
+    elif op in ("encrypt", "decrypt"):
+        # one salt per session, so the key is derived once, before timing
+        session = CryptoSession(reuse_salt=True)
+        with open(payload, "rb") as f:
+            data = f.read()
+        if op == "encrypt":
+            encrypt_payload(password, b"", session)
+            run = lambda: encrypt_payload(password, data, session)
+        else:
+            data = encrypt_payload(password, data, session)
+            run = lambda: decrypt_payload(password, data, session)
+    elif op == "append_embed":
+        run = lambda: append_embed(cover, stream_payload(None, payload), out)
+    elif op == "lsb_embed":
+        run = lambda: lsb_embed(cover, stream_payload(None, payload), out)
+    elif op == "append_extract":
+        # the carrier is built here, untimed, so extracts never depend on
+        # an earlier embed run (or a stale file in a reused workdir)
+        append_embed(cover, stream_payload(None, payload), out)
+        run = lambda: append_extract(out, out + ".zip")
+    else:
+        lsb_embed(cover, stream_payload(None, payload), out)
+        run = lambda: lsb_extract(out, out + ".zip")
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, _peak_rss()
+
+def bench_suite(workdir: str, covers=(0.3, 2.0, 12.0), payloads=(64 * 2**10, 2**20, 16 * 2**20),
+                ops=BENCH_OPS, password: str = "stegobox-bench", repeat: int = 1):
+    # Times each op on synthetic covers (megapixels) and payloads (bytes).
+    # Inputs come from fixed seeds, so every run measures the same data;
+    # they are cached in workdir to save regenerating them. Yields one
+    # record per measurement; LSB pairs whose payload does not fit the
+    # cover are skipped.
+    ctx = multiprocessing.get_context("spawn")
+    for size in payloads:
+        folder = os.path.join(workdir, f"payload_{size}")
+        zip_path = folder + ".zip"
+        if not os.path.exists(zip_path):
+            synthetic_payload(folder, size)
+            with open(zip_path + ".tmp", "wb") as f:
+                zip_folder_to_stream(folder, f)
+            os.replace(zip_path + ".tmp", zip_path)
+        zip_len = os.path.getsize(zip_path)
+        jobs = [(op, None, None, None) for op in ("zip", "encrypt", "decrypt") if op in ops]
+        for mp in covers:
+            cover = os.path.join(workdir, f"cover_{mp:g}mp.png")
+            if not os.path.exists(cover):
+                synthetic_cover(mp).save(cover, format="PNG", compress_level=1)
+            with Image.open(cover) as img:
+                fits = _lsb_body_capacity(img, 1) >= zip_len + 64  # container overhead
+            for method in ("append", "lsb"):
+                out = os.path.join(workdir, f"{method}_{mp:g}mp_{size}.png")
+                for op in (f"{method}_embed", f"{method}_extract"):
+                    if op in ops and (method == "append" or fits):
+                        jobs.append((op, mp, cover, out))
+        for op, mp, cover, out in jobs:
+            with concurrent.futures.ProcessPoolExecutor(1, mp_context=ctx) as pool:
+                seconds, peak = pool.submit(_bench_op, op, cover, folder, zip_path, out,
+                                            password, repeat).result()
+            moved = size if op == "zip" else zip_len
+            yield {"op": op, "cover_mp": mp, "payload_size": size, "payload_bytes": moved,
+                   "seconds": seconds, "mb_per_s": moved / seconds / 1e6 if seconds else None,
+                   "peak_rss": peak}
+
+def bench_host() -> dict:
+    return {"host": platform.node(), "platform": platform.platform(), "python": platform.python_version(),
+            "cpus": os.cpu_count(), "numpy": np is not None}
+
+def compare_bench(results: list, baseline: list, threshold: float = 0.2, floor: float = 0.01) -> list:
+    # Records slower than their baseline match by more than `threshold`
+    # (0.2 = 20%), as (record, baseline seconds) pairs. Records match on
+    # op, cover size and payload size; unmatched ones are ignored, as are
+    # timings that stay under `floor` seconds, which are mostly noise.
+    key = lambda r: (r["op"], r["cover_mp"], r["payload_size"])
+    base = {key(r): r["seconds"] for r in baseline}
+    return [(r, base[key(r)]) for r in results
+            if key(r) in base and r["seconds"] >= floor
+            and r["seconds"] > base[key(r)] * (1 + threshold)]
+
 # ---------- CLI ----------
 def main():
     p = argparse.ArgumentParser(prog="StegoBox", 
                                description="Hide and extract ZIPs in images (append or LSB). Created by @Risterz")
+    p.add_argument("--timings", action="store_true",
+                   help="Print a stage-by-stage time breakdown (batch-embed: percentiles over jobs).")
+    p.add_argument("--cprofile", metavar="FILE", help="Write cProfile stats for the command to FILE.")
     sub = p.add_subparsers(dest="cmd", required=True)
 
     # append-embed
@@ -238,12 +2212,31 @@ def main():
     g = a1.add_mutually_exclusive_group(required=True)
     g.add_argument("--input-folder", help="Folder to zip and embed.")
     g.add_argument("--input-zip", help="Existing ZIP to embed.")
-    a1.add_argument("--out", required=True, help="Output stego image (e.g., stego.png).")
+    a1.add_argument("--zip-workers", type=int, help="Threads used to compress --input-folder (default: all cores).")
+    o1 = a1.add_mutually_exclusive_group(required=True)
+    o1.add_argument("--out", help="Output stego image (e.g., stego.png).")
+    o1.add_argument("--in-place", action="store_true",
+                    help="Append to the cover file itself instead of copying it.")
+    a1.add_argument("--password", help="Encrypt the payload (format 2 only).")
+    a1.add_argument("--kdf", type=parse_kdf, help="Key derivation (see lsb-embed --kdf).")
+    a1.add_argument("--format", type=int, choices=[1, 2], default=VERSION,
+                    help="Container format; 1 is readable by older releases (no --password).")
 
     # append-extract
     a2 = sub.add_parser("append-extract", help="Extract appended ZIP from stego image.")
     a2.add_argument("--stego", required=True, help="Stego image path.")
     a2.add_argument("--out", required=True, help="Output ZIP path.")
+    a2.add_argument("--password", help="Password if encryption was used (will prompt if missing).")
+
+    # list / extract-member
+    m1 = sub.add_parser("list", help="List the ZIP members of a hidden payload without extracting it.")
+    m1.add_argument("--stego", required=True, help="Stego image path.")
+    m1.add_argument("--password", help="Password if encryption was used (will prompt if missing).")
+    m2 = sub.add_parser("extract-member", help="Extract single ZIP members from a hidden payload.")
+    m2.add_argument("--stego", required=True, help="Stego image path.")
+    m2.add_argument("member", nargs="+", help="Member names, as shown by `list`.")
+    m2.add_argument("--out-dir", default=".", help="Directory to extract into (default: current).")
+    m2.add_argument("--password", help="Password if encryption was used (will prompt if missing).")
 
     # lsb-embed
     l1 = sub.add_parser("lsb-embed", help="Embed ZIP via LSB (PNG/BMP recommended).")
@@ -251,8 +2244,24 @@ def main():
     g2 = l1.add_mutually_exclusive_group(required=True)
     g2.add_argument("--input-folder", help="Folder to zip and embed.")
     g2.add_argument("--input-zip", help="Existing ZIP to embed.")
-    l1.add_argument("--out", required=True, help="Output stego image (PNG will be used).")
+    l1.add_argument("--zip-workers", type=int, help="Threads used to compress --input-folder (default: all cores).")
+    l1.add_argument("--out", required=True,
+                    help="Output stego image; .bmp/.tif/.tiff write that format, anything else PNG.")
     l1.add_argument("--password", help="Optional password (if omitted, you'll be prompted).")
+    l1.add_argument("--kdf", type=parse_kdf, help="Key derivation, e.g. pbkdf2:600000 or scrypt:32768:8:1 "
+                                                  "(default: STEGOBOX_KDF or pbkdf2:200000).")
+    l1.add_argument("--format", type=int, choices=[1, 2], default=VERSION,
+                    help="Container format; 1 is readable by older releases (1 bit, "
+                         "pbkdf2:200000 encryption).")
+    l1.add_argument("--bits", type=int, choices=range(1, LSB_MAX_BITS + 1), default=1,
+                    help="Low bits used per channel (more capacity, more visible; default 1).")
+    l1.add_argument("--max-memory", type=int, metavar="MB",
+                    help="Embed in row strips using about this much working memory (same output).")
+    l1.add_argument("--profile", choices=list(ENCODER_PROFILES), default=DEFAULT_PROFILE,
+                    help="Encoder speed/size tradeoff; always lossless (default balanced). "
+                         "An --out ending in .bmp/.tif/.tiff is written in that format.")
+    l1.add_argument("--png-threads", type=int, metavar="N",
+                    help="Deflate the PNG on N threads (0 = all cores; default: single-threaded).")
 
     # lsb-extract
     l2 = sub.add_parser("lsb-extract", help="Extract LSB-embedded ZIP.")
@@ -260,26 +2269,150 @@ def main():
     l2.add_argument("--out", required=True, help="Output ZIP path.")
     l2.add_argument("--password", help="Password if encryption was used (will prompt if missing).")
 
+    # shard-embed / shard-extract
+    h1 = sub.add_parser("shard-embed", help="Spread one payload over several covers via LSB.")
+    h1.add_argument("--covers", required=True, nargs="+", help="Cover images (PNG/BMP recommended).")
+    g3 = h1.add_mutually_exclusive_group(required=True)
+    g3.add_argument("--input-folder", help="Folder to zip and embed.")
+    g3.add_argument("--input-zip", help="Existing ZIP to embed.")
+    h1.add_argument("--out-dir", required=True, help="Directory for the stego images (<cover stem>.png).")
+    h1.add_argument("--bits", type=int, choices=range(1, LSB_MAX_BITS + 1), default=1,
+                    help="Low bits used per channel (default 1).")
+    h1.add_argument("--password", help="Encrypt the payload with this password.")
+    h1.add_argument("--kdf", type=parse_kdf, help="Key derivation (see lsb-embed --kdf).")
+    h1.add_argument("--workers", type=int, help="Worker processes (default: all cores).")
+    h1.add_argument("--profile", choices=list(ENCODER_PROFILES), default=DEFAULT_PROFILE,
+                    help="Encoder speed/size tradeoff (see lsb-embed --profile).")
+    h2 = sub.add_parser("shard-extract", help="Reassemble a payload from all of its shard covers.")
+    h2.add_argument("stego", nargs="+", help="Every stego image of the set, in any order.")
+    h2.add_argument("--out", required=True, help="Output ZIP path.")
+    h2.add_argument("--password", help="Password if encryption was used (will prompt if missing).")
+    h2.add_argument("--workers", type=int, help="Worker processes (default: all cores).")
+
+    # batch-embed
+    b1 = sub.add_parser("batch-embed", help="Run many append/LSB embeds across a process pool.")
+    src = b1.add_mutually_exclusive_group(required=True)
+    src.add_argument("--jobs", help="CSV or JSONL job list (cover, payload, out, method).")
+    src.add_argument("--covers", help="Directory of covers, paired by name with --payloads.")
+    b1.add_argument("--payloads", help="Directory of <stem>/ folders or <stem>.zip files (with --covers).")
+    b1.add_argument("--out-dir", help="Output directory (with --covers).")
+    b1.add_argument("--method", choices=["append", "lsb"], default="append",
+                    help="Method for paired jobs and jobs that do not name one.")
+    b1.add_argument("--workers", type=int, help="Worker processes (default: all cores).")
+    b1.add_argument("--encrypt", action="store_true", help="Encrypt every job (password from STEGOBOX_PASSWORD or prompt).")
+    b1.add_argument("--reuse-salt", action="store_true",
+                    help="Use one salt per worker so the password is derived once, not per job.")
+    b1.add_argument("--kdf", type=parse_kdf, help="Key derivation for --encrypt (see lsb-embed --kdf).")
+    b1.add_argument("--summary", help="Write per-job status and timing here (.csv, otherwise JSONL).")
+
+    # scan
+    s1 = sub.add_parser("scan", help="Find (and optionally extract) hidden payloads under a directory.")
+    s1.add_argument("--root", required=True, help="Directory to walk.")
+    s1.add_argument("--out-dir", help="Extract hits here as <relpath>.<method>.zip.")
+    s1.add_argument("--report", help="JSONL report of hits (default: stdout).")
+    s1.add_argument("--workers", type=int, help="Worker processes (default: all cores).")
+    s1.add_argument("--password", help="Decrypt encrypted hits (default: STEGOBOX_PASSWORD).")
+
+    # probe
+    p1 = sub.add_parser("probe", help="Report hidden payloads without extracting them.")
+    p1.add_argument("stego", nargs="+", help="Files to probe.")
+    p1.add_argument("--json", action="store_true", help="Print one JSON record per carrier.")
+
+    # calibrate
+    c1 = sub.add_parser("calibrate", help="Pick KDF parameters that cost about --target-ms on this host.")
+    c1.add_argument("--kdf", choices=sorted(_KDF_IDS), default="pbkdf2", help="KDF to calibrate.")
+    c1.add_argument("--target-ms", type=float, default=500.0, help="Time one key derivation should take.")
+
+    # bench
+    n1 = sub.add_parser("bench", help="Time the core operations (or encoder profiles) on this host.")
+    n1.add_argument("--covers", type=float, nargs="+", default=[0.3, 2.0, 12.0], metavar="MP",
+                    help="Synthetic cover sizes in megapixels (default: 0.3 2 12).")
+    n1.add_argument("--payloads", type=parse_size, nargs="+", default=[64 * 2**10, 2**20, 16 * 2**20],
+                    metavar="SIZE", help="Synthetic payload sizes, e.g. 64K 1M 1G (default: 64K 1M 16M).")
+    n1.add_argument("--ops", nargs="+", choices=BENCH_OPS, default=list(BENCH_OPS),
+                    help="Operations to time (default: all).")
+    n1.add_argument("--repeat", type=int, default=1, help="Runs per measurement; the best is kept.")
+    n1.add_argument("--workdir", help="Keep (and reuse) the synthetic inputs here (default: a temp dir).")
+    n1.add_argument("--save", help="Write the results as JSON, for use as a later --baseline.")
+    n1.add_argument("--baseline", help="JSON from an earlier --save; fail on regressions.")
+    n1.add_argument("--threshold", type=float, default=0.2,
+                    help="Slowdown against --baseline that counts as a regression (default 0.2 = 20%%).")
+    n1.add_argument("--encoders", action="store_true",
+                    help="Compare encoder profiles (time and size) instead of timing the operations.")
+    n1.add_argument("--cover", help="With --encoders: cover to encode (default: synthetic).")
+    n1.add_argument("--megapixels", type=float, default=4.0, help="With --encoders: synthetic cover size.")
+    n1.add_argument("--fill", type=float, default=0.5, help="With --encoders: LSB capacity filled first.")
+    n1.add_argument("--png-threads", type=int, default=0, metavar="N",
+                    help="With --encoders: threads for the parallel PNG writer (default: all cores).")
+    n1.add_argument("--json", action="store_true", help="Print JSON instead of a table.")
+
     args = p.parse_args()
+    events = []
+    if args.timings:
+        add_stage_observer(events.append)
+    profiler = cProfile.Profile() if args.cprofile else None
+    if profiler is not None:
+        profiler.enable()
 
     try:
         if args.cmd == "append-embed":
-            payload = load_payload(args.input_folder, args.input_zip)
-            append_embed(args.cover, payload, args.out)
-            print(f"[OK] Appended payload into: {args.out}")
+            zip_stats = {}
+            payload = stream_payload(args.input_folder, args.input_zip, args.zip_workers, zip_stats)
+            append_embed(args.cover, payload, args.out, in_place=args.in_place,
+                         password=args.password, kdf=args.kdf, version=args.format)
+            if zip_stats:
+                print(f"[INFO] {format_zip_report(zip_stats)}")
+            print(f"[OK] Appended payload into: {args.out or args.cover}")
 
         elif args.cmd == "append-extract":
-            append_extract(args.stego, args.out)
+            pw = args.password
+            try:
+                append_extract(args.stego, args.out, password=pw)
+            except ValueError as e:
+                if "Password required" in str(e) and pw is None:
+                    append_extract(args.stego, args.out, password=read_password())
+                else:
+                    raise
             print(f"[OK] Extracted ZIP to: {args.out}")
 
+        elif args.cmd in ("list", "extract-member"):
+            pw = args.password
+            try:
+                payload = open_payload(args.stego, password=pw)
+            except ValueError as e:
+                if "Password required" in str(e) and pw is None:
+                    payload = open_payload(args.stego, password=read_password())
+                else:
+                    raise
+            with payload, zipfile.ZipFile(payload) as zf:
+                if args.cmd == "list":
+                    total = 0
+                    for info in zf.infolist():
+                        total += info.file_size
+                        print(f"{info.file_size:>14,}  {info.compress_size:>14,}  {info.filename}")
+                    print(f"[OK] {len(zf.infolist())} members, {total:,} bytes")
+                else:
+                    for name in args.member:
+                        print(f"[OK] Extracted {name} to: {zf.extract(name, args.out_dir)}")
+
         elif args.cmd == "lsb-embed":
-            payload = load_payload(args.input_folder, args.input_zip)
+            zip_stats = {}
+            payload = stream_payload(args.input_folder, args.input_zip, args.zip_workers, zip_stats)
             pw = args.password
             if pw is None:
                 choice = input("Encrypt with password? [y/N]: ").strip().lower()
                 if choice == "y":
                     pw = read_password(confirm=True)
-            lsb_embed(args.cover, payload, args.out, password=pw)
+            lsb_stats = {}
+            lsb_embed(args.cover, payload, args.out, password=pw, kdf=args.kdf, version=args.format,
+                      bits=args.bits, max_memory=args.max_memory and args.max_memory * 1024 * 1024,
+                      stats=lsb_stats, profile=args.profile, png_threads=args.png_threads)
+            if args.max_memory:
+                peak = lsb_stats["peak_rss"]
+                print(f"[INFO] {lsb_stats['strips']} strips of {lsb_stats['strip_rows']} rows"
+                      + (f", peak RSS {peak / 2**20:.0f} MiB" if peak else ""))
+            if zip_stats:
+                print(f"[INFO] {format_zip_report(zip_stats)}")
             print(f"[OK] LSB embedded into: {args.out}")
 
         elif args.cmd == "lsb-extract":
@@ -296,9 +2429,174 @@ def main():
                     raise
             print(f"[OK] Extracted ZIP to: {args.out}")
 
+        elif args.cmd == "shard-embed":
+            os.makedirs(args.out_dir, exist_ok=True)
+            outs = [os.path.join(args.out_dir, os.path.splitext(os.path.basename(c))[0] + ".png")
+                    for c in args.covers]
+            if len(set(outs)) != len(outs):
+                raise ValueError("Cover names must be unique (outputs are named after them).")
+            payload = stream_payload(args.input_folder, args.input_zip)
+            lsb_embed_shards(args.covers, payload, outs, password=args.password, kdf=args.kdf,
+                             bits=args.bits, workers=args.workers, profile=args.profile)
+            print(f"[OK] Sharded payload over {len(outs)} images in: {args.out_dir}")
+
+        elif args.cmd == "shard-extract":
+            pw = args.password
+            try:
+                lsb_extract_shards(args.stego, args.out, password=pw, workers=args.workers)
+            except ValueError as e:
+                if "Password required" in str(e) and pw is None:
+                    lsb_extract_shards(args.stego, args.out, password=read_password(), workers=args.workers)
+                else:
+                    raise
+            print(f"[OK] Extracted ZIP to: {args.out}")
+
+        elif args.cmd == "batch-embed":
+            if args.jobs:
+                jobs = load_jobs(args.jobs, args.method)
+            elif args.payloads and args.out_dir:
+                jobs = pair_jobs(args.covers, args.payloads, args.out_dir, args.method)
+            else:
+                raise ValueError("--covers needs --payloads and --out-dir")
+            pw = read_password(confirm=True) if args.encrypt else None
+            write, close = _open_summary(args.summary) if args.summary else (None, None)
+            ok = failed = 0
+            samples = []
+            t0 = time.perf_counter()
+            try:
+                for result in batch_embed(jobs, args.workers, pw, args.reuse_salt, args.kdf,
+                                          stages=args.timings):
+                    if write:
+                        write(result)
+                    if args.timings and result["status"] == "ok":
+                        samples.append(dict(result.get("stages", {}), job=result["seconds"]))
+                    if result["status"] == "ok":
+                        ok += 1
+                    else:
+                        failed += 1
+                        print(f"[FAIL] job {result['job']} ({result['cover']}): {result['error']}",
+                              file=sys.stderr)
+            finally:
+                if close:
+                    close()
+            elapsed = time.perf_counter() - t0
+            print(f"[OK] batch: {ok} ok, {failed} failed, {elapsed:.2f}s "
+                  f"({len(jobs) / elapsed if elapsed else 0:.1f} jobs/s)")
+            for name, row in sorted(stage_percentiles(samples).items(), key=lambda kv: -kv[1]["p50"]):
+                print(f"[TIMING] {name:<15} n={row['count']:<5} p50 {row['p50']:.3f}s  "
+                      f"p90 {row['p90']:.3f}s  p99 {row['p99']:.3f}s  max {row['max']:.3f}s")
+            if failed:
+                sys.exit(1)
+
+        elif args.cmd == "probe":
+            missing = 0
+            for path in args.stego:
+                try:
+                    carriers = probe(path)
+                except Exception as e:  # unreadable path: report it, keep going
+                    missing += 1
+                    if args.json:
+                        print(json.dumps({"path": path, "error": str(e) or type(e).__name__}))
+                    else:
+                        print(f"[ERROR] {path}: {e}", file=sys.stderr)
+                    continue
+                if not carriers:
+                    missing += 1
+                for c in carriers:
+                    if args.json:
+                        print(json.dumps(dict(c, path=path)))
+                    else:
+                        enc = ", encrypted" if c["encrypted"] else ""
+                        shard = f", shard {c['shard']}" if "shard" in c else ""
+                        print(f"[OK] {path}: {c['method']} v{c['version']}, {c['size']:,} bytes{enc}{shard}")
+                if not carriers and not args.json:
+                    print(f"[--] {path}: no hidden data")
+            if missing:
+                sys.exit(1)
+
+        elif args.cmd == "scan":
+            pw = args.password or os.environ.get("STEGOBOX_PASSWORD")
+            report = open(args.report, "w", encoding="utf-8") if args.report else sys.stdout
+            files = found = 0
+            t0 = time.perf_counter()
+            try:
+                for _, hits in scan_tree(args.root, args.out_dir, args.workers, pw):
+                    files += 1
+                    for hit in hits:
+                        found += 1
+                        report.write(json.dumps(hit) + "\n")
+            finally:
+                if report is not sys.stdout:
+                    report.close()
+            elapsed = time.perf_counter() - t0
+            print(f"[OK] scanned {files} files in {elapsed:.2f}s, {found} hits", file=sys.stderr)
+
+        elif args.cmd == "calibrate":
+            kdf, ms = calibrate_kdf(args.kdf, args.target_ms)
+            print(f"[OK] {format_kdf(kdf)} takes {ms:.0f} ms here (target {args.target_ms:.0f} ms)")
+            print(f"export STEGOBOX_KDF={format_kdf(kdf)}")
+
+        elif args.cmd == "bench" and args.encoders:
+            if args.cover:
+                with Image.open(args.cover) as img:
+                    cover = img.convert(_lsb_mode(img))
+            else:
+                cover = synthetic_cover(args.megapixels)
+            results = bench_encoders(cover, args.fill, png_threads=args.png_threads)
+            for r in results:
+                if args.json:
+                    print(json.dumps(r))
+                else:
+                    fmt = r["format"] + (f" x{r['threads']}" if r["threads"] else "")
+                    print(f"[{'OK' if r['lossless'] else 'FAIL'}] {r['profile']:<9} {fmt:<7}"
+                          f"{r['seconds']:8.3f}s {r['bytes']:>14,} bytes "
+                          f"({r['bytes'] / r['raw_bytes']:.0%} of raw, {r['mb_per_s'] or 0:.0f} MB/s)")
+            if not all(r["lossless"] for r in results):
+                sys.exit(1)
+
+        elif args.cmd == "bench":
+            baseline = None
+            if args.baseline:
+                with open(args.baseline, "r", encoding="utf-8") as f:
+                    baseline = json.load(f)["results"]
+            with tempfile.TemporaryDirectory() as tmp:
+                workdir = args.workdir or tmp
+                os.makedirs(workdir, exist_ok=True)
+                results = []
+                for r in bench_suite(workdir, args.covers, args.payloads, args.ops, repeat=args.repeat):
+                    results.append(r)
+                    if not args.json:
+                        cover = f"{r['cover_mp']:g} MP" if r["cover_mp"] is not None else "-"
+                        peak = f"{r['peak_rss'] / 2**20:.0f} MiB" if r["peak_rss"] else "n/a"
+                        print(f"[BENCH] {r['op']:<15}{cover:>9} {r['payload_bytes']:>14,} bytes "
+                              f"{r['seconds']:9.3f}s {r['mb_per_s'] or 0:9.1f} MB/s  peak {peak}")
+            report = {"host": bench_host(), "results": results}
+            if args.save:
+                with open(args.save, "w", encoding="utf-8") as f:
+                    json.dump(report, f, indent=2)
+            if args.json:
+                print(json.dumps(report, indent=2))
+            if baseline is not None:
+                slower = compare_bench(results, baseline, args.threshold)
+                for r, before in slower:
+                    cover = f"{r['cover_mp']:g} MP cover, " if r["cover_mp"] is not None else ""
+                    print(f"[REGRESSION] {r['op']} ({cover}{r['payload_size']:,} byte payload): "
+                          f"{before:.3f}s -> {r['seconds']:.3f}s (+{r['seconds'] / before - 1:.0%})",
+                          file=sys.stderr)
+                if slower:
+                    sys.exit(1)
+                print(f"[OK] No regressions over {args.threshold:.0%} against {args.baseline}")
+
     except Exception as e:
         print(f"[ERROR] {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+            print(f"[INFO] cProfile stats written to: {args.cprofile}", file=sys.stderr)
+        if events:
+            print(f"[TIMING] stages:\n{format_stage_events(events)}", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
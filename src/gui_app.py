@@ -21,9 +21,10 @@ from PIL import Image, ImageTk
 
 # Import steganography functions from the local module
 from example import (
-    zip_folder_to_bytes, load_payload, append_embed, append_extract,
-    lsb_embed, lsb_extract, lsb_capacity, encrypt_payload, decrypt_payload,
-    APPEND_MAGIC, LSB_MAGIC, VERSION
+    zip_folder_to_bytes, load_payload, stream_payload, append_embed, append_extract,
+    lsb_embed, lsb_extract, lsb_capacity, encrypt_payload, decrypt_payload, probe,
+    CryptoSession,
+    APPEND_MAGIC, LSB_MAGIC, LSB_MAX_BITS, VERSION, ENCODER_PROFILES, DEFAULT_PROFILE
 )
 
 # Set the appearance mode and color theme
@@ -43,15 +44,24 @@ class StegoBoxGUI(ctk.CTk):
         self.grid_columnconfigure(1, weight=1)
         self.grid_rowconfigure(0, weight=1)
         
+        # Derived keys are cached for the lifetime of the window
+        self.crypto = CryptoSession()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        
         # Create main interface
         self.create_interface()
     
+    def on_close(self):
+        """Wipe cached keys and close the window"""
+        self.crypto.close()
+        self.destroy()
+    
     def create_interface(self):
         """Create the main GUI interface"""
         # Create sidebar frame
         self.sidebar_frame = ctk.CTkFrame(self, width=140, corner_radius=0)
         self.sidebar_frame.grid(row=0, column=0, rowspan=4, sticky="nsew")
-        self.sidebar_frame.grid_rowconfigure(4, weight=1)
+        self.sidebar_frame.grid_rowconfigure(6, weight=1)
         
         # Sidebar title
         self.logo_label = ctk.CTkLabel(
@@ -74,16 +84,42 @@ class StegoBoxGUI(ctk.CTk):
         )
         self.method_menu.grid(row=2, column=0, padx=20, pady=10)
         
+        # LSB depth (bits per channel)
+        self.bits_label = ctk.CTkLabel(self.sidebar_frame, text="LSB bits/channel:")
+        self.bits_label.grid(row=3, column=0, padx=20, pady=(10, 0))
+        
+        self.bits_var = ctk.StringVar(value="1")
+        self.bits_menu = ctk.CTkOptionMenu(
+            self.sidebar_frame,
+            values=[str(b) for b in range(1, LSB_MAX_BITS + 1)],
+            variable=self.bits_var
+        )
+        self.bits_menu.grid(row=4, column=0, padx=20, pady=10)
+        self.bits_menu.configure(state="disabled")
+        
+        # Output encoder profile (LSB output is always lossless)
+        self.profile_label = ctk.CTkLabel(self.sidebar_frame, text="Output profile:")
+        self.profile_label.grid(row=5, column=0, padx=20, pady=(10, 0))
+        
+        self.profile_var = ctk.StringVar(value=DEFAULT_PROFILE)
+        self.profile_menu = ctk.CTkOptionMenu(
+            self.sidebar_frame,
+            values=list(ENCODER_PROFILES),
+            variable=self.profile_var
+        )
+        self.profile_menu.grid(row=6, column=0, padx=20, pady=10, sticky="n")
+        self.profile_menu.configure(state="disabled")
+        
         # Theme toggle
         self.appearance_mode_label = ctk.CTkLabel(self.sidebar_frame, text="Theme:")
-        self.appearance_mode_label.grid(row=5, column=0, padx=20, pady=(10, 0))
+        self.appearance_mode_label.grid(row=7, column=0, padx=20, pady=(10, 0))
         
         self.appearance_mode_menu = ctk.CTkOptionMenu(
             self.sidebar_frame, 
             values=["Dark", "Light", "System"],
             command=self.change_appearance_mode
         )
-        self.appearance_mode_menu.grid(row=6, column=0, padx=20, pady=(10, 20))
+        self.appearance_mode_menu.grid(row=8, column=0, padx=20, pady=(10, 20))
         
         # Main content area
         self.create_main_content()
@@ -247,9 +283,13 @@ class StegoBoxGUI(ctk.CTk):
         """Handle method selection change"""
         if value == "lsb":
             self.encrypt_check.configure(state="normal")
+            self.bits_menu.configure(state="normal")
+            self.profile_menu.configure(state="normal")
             self.status_var.set("LSB mode selected - invisible hiding with optional encryption")
         else:
             self.encrypt_check.configure(state="disabled")
+            self.bits_menu.configure(state="disabled")
+            self.profile_menu.configure(state="disabled")
             self.encrypt_var.set(False)
             self.password_entry.configure(state="disabled")
             self.status_var.set("Append mode selected - fast hiding, larger file size")
@@ -305,6 +345,7 @@ class StegoBoxGUI(ctk.CTk):
                 ("PNG files", "*.png"),
                 ("JPEG files", "*.jpg"),
                 ("BMP files", "*.bmp"),
+                ("TIFF files", "*.tif *.tiff"),
                 ("All files", "*.*")
             ]
         )
@@ -361,12 +402,12 @@ class StegoBoxGUI(ctk.CTk):
             self.hide_progress.set(0.1)
             self.status_var.set("Loading data...")
             
-            # Load payload
+            # Payload is streamed into the carrier as it is zipped/read
             data_path = self.data_path_var.get()
             if os.path.isdir(data_path):
-                payload = zip_folder_to_bytes(data_path)
+                payload = stream_payload(input_folder=data_path)
             else:
-                payload = load_payload(data_path)
+                payload = stream_payload(input_zip=data_path)
             
             self.hide_progress.set(0.3)
             self.status_var.set("Processing image...")
@@ -383,9 +424,8 @@ class StegoBoxGUI(ctk.CTk):
             else:  # LSB method
                 self.status_var.set("Hiding data using LSB method...")
                 password = self.password_var.get() if self.encrypt_var.get() else None
-                if password:
-                    payload = encrypt_payload(payload, password)
-                lsb_embed(cover_path, payload, output_path)
+                lsb_embed(cover_path, payload, output_path, password=password, session=self.crypto,
+                          bits=int(self.bits_var.get()), profile=self.profile_var.get())
             
             self.hide_progress.set(1.0)
             self.status_var.set("Data hidden successfully!")
@@ -425,36 +465,22 @@ class StegoBoxGUI(ctk.CTk):
             self.extract_progress.set(0.3)
             self.status_var.set("Detecting hidden data...")
             
-            # Try both methods
-            payload = None
-            method_used = None
-            
-            try:
-                payload = append_extract(stego_path)
-                method_used = "append"
-            except:
-                try:
-                    payload = lsb_extract(stego_path)
-                    method_used = "lsb"
-                except:
-                    raise Exception("No hidden data found or corrupted data")
+            # Read the footer / header only, then dispatch on what was found
+            carriers = probe(stego_path)
+            if not carriers:
+                raise ValueError("No hidden data found in this image")
+            info = carriers[0]
+            method_used = info["method"]
+            if info["encrypted"] and not password:
+                raise ValueError("This payload is encrypted - please enter the password")
             
             self.extract_progress.set(0.6)
-            self.status_var.set(f"Extracting data using {method_used} method...")
+            self.status_var.set(f"Extracting {info['size']:,} bytes using {method_used} method...")
             
-            # Decrypt if password provided
-            if password and method_used == "lsb":
-                try:
-                    payload = decrypt_payload(payload, password)
-                except:
-                    raise Exception("Incorrect password or data not encrypted")
-            
-            self.extract_progress.set(0.8)
-            self.status_var.set("Saving extracted data...")
-            
-            # Save extracted data
-            with open(output_path, 'wb') as f:
-                f.write(payload)
+            if method_used == "append":
+                append_extract(stego_path, output_path, password=password, session=self.crypto)
+            else:
+                lsb_extract(stego_path, output_path, password=password, session=self.crypto)
             
             self.extract_progress.set(1.0)
             self.status_var.set("Data extracted successfully!")
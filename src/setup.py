@@ -24,6 +24,7 @@ def install_dependencies():
     
     requirements = [
         "Pillow==10.4.0",
+        "numpy==1.24.4",
         "cryptography==43.0.0", 
         "customtkinter==5.2.2"
     ]
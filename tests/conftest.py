@@ -0,0 +1,60 @@
+import importlib.util
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+import example  # noqa: E402
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+@pytest.fixture
+def fast_kdf():
+    # the cheapest cost _check_kdf allows, for tests that are not about the KDF
+    return example.KdfParams("pbkdf2", iterations=1_000)
+
+
+def _make_image(mode="RGB", size=(67, 53), seed=0):
+    # Gradients plus a little noise in any LSB mode: every PNG filter type
+    # gets picked, and the low bits vary from sample to sample.
+    rng = random.Random(seed)
+    w, h = size
+    bands = example.LSB_MODES[mode]
+    if mode.startswith("I;16"):
+        values = (((x * 3 + y * 5 + b * 40) * 97 + rng.randrange(64)) % 65536
+                  for y in range(h) for x in range(w) for b in range(bands))
+        raw = b"".join(v.to_bytes(2, "big" if mode == "I;16B" else "little") for v in values)
+    else:
+        raw = bytes((x * 3 + y * 5 + b * 40 + rng.randrange(6)) % 256
+                    for y in range(h) for x in range(w) for b in range(bands))
+    return example.Image.frombytes(mode, size, raw)
+
+
+@pytest.fixture
+def make_image():
+    return _make_image
+
+
+@pytest.fixture
+def data_path():
+    # files in tests/data were written by the format 1 release of example.py
+    return lambda name: os.path.join(DATA, name)
+
+
+@pytest.fixture
+def payload(data_path):
+    with open(data_path("payload.zip"), "rb") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="session")
+def release_v1():
+    # example.py as released with format 1, to check what older readers see
+    spec = importlib.util.spec_from_file_location("release_v1", os.path.join(DATA, "release_v1.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
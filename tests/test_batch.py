@@ -0,0 +1,18 @@
+import pytest
+
+from example import append_extract, batch_embed, lsb_extract, probe
+
+
+@pytest.mark.parametrize("password", [None, "pw"])
+def test_batch_encrypts_every_method(data_path, payload, tmp_path, password, fast_kdf):
+    jobs = [{"cover": data_path("cover.png"), "payload": data_path("payload.zip"),
+             "out": str(tmp_path / f"{method}.png"), "method": method}
+            for method in ("append", "lsb")]
+    results = list(batch_embed(jobs, workers=1, password=password, kdf=fast_kdf))
+    assert [r["status"] for r in results] == ["ok", "ok"]
+    for method, extract in (("append", append_extract), ("lsb", lsb_extract)):
+        stego, out = tmp_path / f"{method}.png", tmp_path / f"{method}.zip"
+        hits = [h for h in probe(str(stego)) if h["method"] == method]
+        assert hits[0]["encrypted"] == bool(password)
+        extract(str(stego), str(out), password)
+        assert out.read_bytes() == payload
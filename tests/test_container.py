@@ -0,0 +1,142 @@
+import io
+import zipfile
+
+import pytest
+
+import example
+from example import (append_embed, append_extract, extract_container, lsb_embed,
+                     lsb_extract, open_payload, parse_container, write_container)
+
+
+def _body(payload, password=None, kdf=None):
+    f = io.BytesIO()
+    write_container(f, payload, password, kdf=kdf)
+    return f.getvalue()
+
+
+def _read_at(body):
+    return lambda offset, n: body[offset:offset + n]
+
+
+@pytest.mark.parametrize("password", [None, "pw"])
+@pytest.mark.parametrize("size", [0, 10, example.CONTAINER_CHUNK_SIZE, 3 * example.CONTAINER_CHUNK_SIZE + 5])
+def test_container_round_trip(password, size, fast_kdf):
+    payload = bytes(i % 251 for i in range(size))
+    body = _body(payload, password, fast_kdf)
+    info = parse_container(_read_at(body), len(body))
+    assert info.enc == (1 if password else 0)
+    out = io.BytesIO()
+    extract_container(_read_at(body), len(body), out, password)
+    assert out.getvalue() == payload
+
+
+def test_container_chunk_checksum():
+    body = bytearray(_body(b"z" * 100_000))
+    body[10] ^= 1
+    with pytest.raises(ValueError, match="checksum"):
+        extract_container(_read_at(bytes(body)), len(body), io.BytesIO())
+
+
+def test_container_bad_length():
+    body = _body(b"abc")
+    with pytest.raises(ValueError, match="Corrupt container"):
+        parse_container(_read_at(body + b"\0"), len(body) + 1)
+
+
+@pytest.mark.parametrize("password", [None, "pw"])
+def test_append_v2_round_trip(data_path, payload, tmp_path, password, fast_kdf):
+    stego, out = tmp_path / "s.png", tmp_path / "out.zip"
+    append_embed(data_path("cover.png"), payload, str(stego), password=password, kdf=fast_kdf)
+    append_extract(str(stego), str(out), password)
+    assert out.read_bytes() == payload
+
+
+@pytest.mark.parametrize("password", [None, "pw"])
+def test_lsb_v2_round_trip(data_path, payload, tmp_path, password, fast_kdf):
+    stego, out = tmp_path / "s.png", tmp_path / "out.zip"
+    lsb_embed(data_path("cover.png"), payload, str(stego), password=password, kdf=fast_kdf)
+    lsb_extract(str(stego), str(out), password)
+    assert out.read_bytes() == payload
+
+
+@pytest.mark.parametrize("name", ["s.png", "s.bmp"])
+def test_open_payload_members(data_path, payload, tmp_path, name, fast_kdf):
+    stego = tmp_path / name
+    lsb_embed(data_path("cover.png"), payload, str(stego), password="pw", kdf=fast_kdf)
+    with open_payload(str(stego), "pw") as f, zipfile.ZipFile(f) as zf:
+        assert zf.read("hello.txt") == b"hidden in plain sight\n" * 20
+
+
+def test_baseline_append_v1(data_path, payload, tmp_path):
+    out = tmp_path / "out.zip"
+    append_extract(data_path("append_v1.png"), str(out))
+    assert out.read_bytes() == payload
+
+
+def test_baseline_encrypted_lsb_v1(data_path, payload, tmp_path):
+    out = tmp_path / "out.zip"
+    lsb_extract(data_path("lsb_v1_encrypted.png"), str(out), "correct horse")
+    assert out.read_bytes() == payload
+
+
+@pytest.mark.parametrize("extract, name", [(lsb_extract, "lsb_v1_encrypted.png"),
+                                           (lsb_extract, None), (append_extract, None)])
+def test_wrong_password_leaves_no_output(data_path, payload, tmp_path, fast_kdf, extract, name):
+    out = tmp_path / "out.zip"
+    if name is None:
+        name = tmp_path / "s.png"
+        embed = lsb_embed if extract is lsb_extract else append_embed
+        embed(data_path("cover.png"), payload, str(name), password="pw", kdf=fast_kdf)
+    else:
+        name = data_path(name)
+    with pytest.raises(ValueError, match="Incorrect password"):
+        extract(str(name), str(out), "wrong")
+    assert list(tmp_path.glob("out.zip*")) == []
+
+
+@pytest.mark.parametrize("password", [None, "pw"])
+def test_lsb_v1_opens_in_release_v1(data_path, payload, tmp_path, release_v1, password):
+    stego, out = tmp_path / "s.png", tmp_path / "out.zip"
+    lsb_embed(data_path("cover.png"), payload, str(stego), password=password, version=1)
+    release_v1.lsb_extract(str(stego), str(out), password)
+    assert out.read_bytes() == payload
+
+
+def test_append_v1_opens_in_release_v1(data_path, payload, tmp_path, release_v1):
+    stego, out = tmp_path / "s.png", tmp_path / "out.zip"
+    append_embed(data_path("cover.png"), payload, str(stego), version=1)
+    release_v1.append_extract(str(stego), str(out))
+    assert out.read_bytes() == payload
+
+
+def test_v1_refuses_what_older_readers_cannot_open(data_path, payload, tmp_path, fast_kdf):
+    with pytest.raises(ValueError, match="Format 1"):
+        lsb_embed(data_path("cover.png"), payload, str(tmp_path / "s.png"), password="pw",
+                  kdf=fast_kdf, version=1)
+    with pytest.raises(ValueError, match="Format 1"):
+        append_embed(data_path("cover.png"), payload, str(tmp_path / "a.png"), password="pw", version=1)
+
+
+def test_failed_append_leaves_no_output(data_path, tmp_path):
+    def payload(f):
+        f.write(b"partial")
+        raise OSError("payload source went away")
+
+    out = tmp_path / "s.png"
+    with pytest.raises(OSError):
+        append_embed(data_path("cover.png"), payload, str(out))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_in_place_append_restores_cover(data_path, tmp_path):
+    def payload(f):
+        f.write(b"partial")
+        raise OSError("payload source went away")
+
+    cover = tmp_path / "c.png"
+    with open(data_path("cover.png"), "rb") as f:
+        original = f.read()
+    cover.write_bytes(original)
+    with pytest.raises(OSError):
+        append_embed(str(cover), payload, in_place=True)
+    assert cover.read_bytes() == original
@@ -0,0 +1,105 @@
+import io
+
+import pytest
+
+import example
+from example import decrypt_payload, decrypt_stream, encrypt_payload, encrypt_stream
+
+
+@pytest.mark.parametrize("size", [0, 1, 1000, example.ENC_CHUNK_SIZE, 3 * example.ENC_CHUNK_SIZE,
+                                  3 * example.ENC_CHUNK_SIZE + 17])
+def test_round_trip(size, fast_kdf):
+    data = bytes(range(256)) * (size // 256) + bytes(size % 256)
+    blob = encrypt_payload("pw", data, kdf=fast_kdf)
+    assert blob[0] == 0x30
+    assert decrypt_payload("pw", blob) == data
+
+
+def test_stream_round_trip_small_chunks(fast_kdf):
+    data = b"chunked " * 1000
+    sealed, out = io.BytesIO(), io.BytesIO()
+    encrypt_stream("pw", io.BytesIO(data), sealed, kdf=fast_kdf, chunk_size=100)
+    sealed.seek(0)
+    assert decrypt_stream("pw", sealed, out) == len(data)
+    assert out.getvalue() == data
+
+
+def test_wrong_password(fast_kdf):
+    blob = encrypt_payload("pw", b"secret", kdf=fast_kdf)
+    with pytest.raises(ValueError, match="Incorrect password"):
+        decrypt_payload("other", blob)
+
+
+def test_tampered_chunk_fails(fast_kdf):
+    blob = bytearray(encrypt_payload("pw", b"x" * 200_000, kdf=fast_kdf))
+    blob[100] ^= 1
+    with pytest.raises(ValueError):
+        decrypt_payload("pw", bytes(blob))
+
+
+def test_truncated_stream_fails(fast_kdf):
+    # the last-chunk flag in the nonce stops a cut at a chunk boundary
+    sealed = io.BytesIO()
+    encrypt_stream("pw", io.BytesIO(b"y" * 1000), sealed, kdf=fast_kdf, chunk_size=100)
+    blob = sealed.getvalue()
+    # 1000 bytes seal as ten full chunks and an empty final one (its tag)
+    with pytest.raises(ValueError):
+        decrypt_payload("pw", blob[:-16])
+
+
+def test_legacy_fernet_blob(data_path):
+    # 0x10 envelope written by the format 1 release
+    with open(data_path("legacy_0x10.bin"), "rb") as f:
+        blob = f.read()
+    assert blob[0] == 0x10
+    assert decrypt_payload("correct horse", blob) == b"legacy fernet payload"
+    with pytest.raises(ValueError, match="Incorrect password"):
+        decrypt_payload("wrong", blob)
+
+
+@pytest.fixture
+def derivations(monkeypatch):
+    # salts passed to derive_key, in call order
+    calls = []
+    real = example.derive_key
+
+    def derive_key(password, salt, kdf=example.DEFAULT_KDF):
+        calls.append(bytes(salt))
+        return real(password, salt, kdf)
+    monkeypatch.setattr(example, "derive_key", derive_key)
+    return calls
+
+
+@pytest.mark.parametrize("reuse_salt, expected", [(True, 1), (False, 3)])
+def test_session_reuse_salt(derivations, fast_kdf, reuse_salt, expected):
+    with example.CryptoSession(reuse_salt=reuse_salt, kdf=fast_kdf) as session:
+        blobs = [encrypt_payload("pw", b"job %d" % i, session) for i in range(3)]
+        assert len(derivations) == expected
+        # decrypting in the same session hits the cache
+        assert [decrypt_payload("pw", blob, session) for blob in blobs] == [b"job 0", b"job 1", b"job 2"]
+        assert len(derivations) == expected
+
+
+def test_session_lru_eviction(derivations, fast_kdf):
+    session = example.CryptoSession(max_keys=2)
+    salts = [bytes([i]) * 16 for i in range(3)]
+    keys = [session.derive_key("pw", salt, fast_kdf) for salt in salts[:2]]
+    held = list(session._keys.values())
+    session.derive_key("pw", salts[0], fast_kdf)  # now the most recently used
+    session.derive_key("pw", salts[2], fast_kdf)  # evicts salts[1]
+    assert held[1] == bytes(len(held[1]))  # the evicted key was wiped
+    assert session.derive_key("pw", salts[0], fast_kdf) == keys[0]
+    assert derivations == salts
+    assert session.derive_key("pw", salts[1], fast_kdf) == keys[1]
+    assert derivations == salts + [salts[1]]
+
+
+def test_session_close_wipes_keys(fast_kdf):
+    session = example.CryptoSession()
+    session.derive_key("pw", bytes(16), fast_kdf)
+    session.derive_key("other", bytes(16), fast_kdf)
+    held = list(session._keys.values())
+    assert all(any(key) for key in held)
+    session.close()
+    assert all(key == bytes(len(key)) for key in held)
+    assert not session._keys
@@ -0,0 +1,76 @@
+import struct
+
+import pytest
+
+import example
+from example import (DEFAULT_KDF, KdfParams, _pack_kdf, _unpack_kdf, calibrate_kdf, decrypt_payload,
+                     encrypt_payload, format_kdf, parse_kdf)
+
+SCRYPT = KdfParams("scrypt", n=2 ** 10, r=8, p=1)
+
+
+@pytest.mark.parametrize("spec, kdf", [
+    ("pbkdf2:200000", DEFAULT_KDF),
+    ("PBKDF2:1000", KdfParams("pbkdf2", iterations=1_000)),
+    ("scrypt:32768:8:1", KdfParams("scrypt", n=32768, r=8, p=1)),
+])
+def test_parse_and_format(spec, kdf):
+    assert parse_kdf(spec) == kdf
+    assert parse_kdf(format_kdf(kdf)) == kdf
+
+
+@pytest.mark.parametrize("spec", [
+    "pbkdf2", "pbkdf2:abc", "pbkdf2:999", "pbkdf2:10000001", "argon2:1",
+    "scrypt:1000:8:1",      # N not a power of two
+    "scrypt:1048576:16:1",  # 2 GiB
+    "scrypt:1024:8:17",     # p past the cap
+    "scrypt:1024:8",
+])
+def test_parse_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_kdf(spec)
+
+
+@pytest.mark.parametrize("kdf", [DEFAULT_KDF, SCRYPT, KdfParams("scrypt", n=2 ** 20, r=8, p=16)])
+def test_descriptor_round_trip(kdf):
+    blob = b"xx" + _pack_kdf(kdf) + b"rest"
+    assert _unpack_kdf(blob, 2) == (kdf, len(blob) - 4)
+
+
+@pytest.mark.parametrize("descriptor", [
+    struct.pack("<BI", 1, 100_000_000),   # minutes of PBKDF2 per file
+    struct.pack("<BBBB", 2, 24, 64, 64),  # scrypt wanting 128 GiB
+    struct.pack("<BBBB", 2, 10, 8, 0),
+    struct.pack("<BI", 9, 0),
+    b"\x02\x0a",
+])
+def test_hostile_header_rejected_before_derivation(descriptor, monkeypatch):
+    def derive_key(*args):
+        raise AssertionError("key derived from an unchecked header")
+    monkeypatch.setattr(example, "derive_key", derive_key)
+    blob = b"\x30" + descriptor + b"\x10" + bytes(16) + bytes(7) + struct.pack("<I", 1024) + bytes(64)
+    with pytest.raises(ValueError):
+        decrypt_payload("pw", blob)
+
+
+def test_scrypt_round_trip():
+    blob = encrypt_payload("pw", b"scrypt payload", kdf=SCRYPT)
+    assert _unpack_kdf(blob, 1)[0] == SCRYPT
+    assert decrypt_payload("pw", blob) == b"scrypt payload"
+    with pytest.raises(ValueError, match="Incorrect password"):
+        decrypt_payload("other", blob)
+
+
+def test_kdf_from_environment(monkeypatch):
+    monkeypatch.setenv("STEGOBOX_KDF", "scrypt:1024:8:1")
+    blob = encrypt_payload("pw", b"env")
+    assert _unpack_kdf(blob, 1)[0] == SCRYPT
+    assert decrypt_payload("pw", blob) == b"env"
+
+
+def test_calibrate_stays_in_bounds():
+    kdf, ms = calibrate_kdf("pbkdf2", target_ms=20)
+    assert parse_kdf(format_kdf(kdf)) == kdf
+    assert ms > 0
+    with pytest.raises(ValueError):
+        calibrate_kdf("argon2")
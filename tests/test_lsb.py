@@ -0,0 +1,114 @@
+import gc
+import warnings
+
+import pytest
+from PIL import Image
+
+import example
+from example import _lsb_embed_numpy, _lsb_embed_python, lsb_embed, lsb_extract
+
+
+def _embed_both(img, parts):
+    a, b = img.copy(), img.copy()
+    _lsb_embed_numpy(a, parts)
+    _lsb_embed_python(b, parts)
+    return a, b
+
+
+def test_numpy_and_python_embed_match(data_path, payload):
+    pytest.importorskip("numpy")
+    img = Image.open(data_path("cover.png"))
+    img.load()
+    a, b = _embed_both(img, [(payload, 1)])
+    assert a.tobytes() == b.tobytes()
+    assert a.tobytes() != img.tobytes()
+
+
+def test_version_1_matches_baseline_png(data_path, payload, tmp_path):
+    out = tmp_path / "v1.png"
+    lsb_embed(data_path("cover.png"), payload, str(out), version=1)
+    with open(data_path("lsb_v1.png"), "rb") as f:
+        assert out.read_bytes() == f.read()
+
+
+def test_baseline_v1_extracts(data_path, payload, tmp_path):
+    out = tmp_path / "out.zip"
+    lsb_extract(data_path("lsb_v1.png"), str(out))
+    assert out.read_bytes() == payload
+
+
+def test_round_trip(data_path, payload, tmp_path):
+    stego, out = tmp_path / "s.png", tmp_path / "out.zip"
+    lsb_embed(data_path("cover.png"), payload, str(stego))
+    lsb_extract(str(stego), str(out))
+    assert out.read_bytes() == payload
+
+
+def test_round_trip_without_numpy(data_path, payload, tmp_path, monkeypatch):
+    monkeypatch.setattr(example, "np", None)
+    stego, out = tmp_path / "s.png", tmp_path / "out.zip"
+    lsb_embed(data_path("cover.png"), payload, str(stego), version=1)
+    lsb_extract(str(stego), str(out))
+    assert out.read_bytes() == payload
+    with open(data_path("lsb_v1.png"), "rb") as f:
+        assert stego.read_bytes() == f.read()
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L", "LA", "I;16"])
+@pytest.mark.parametrize("bits", [1, 2, 3, 4])
+def test_fallback_matches_numpy(mode, bits, payload, make_image):
+    pytest.importorskip("numpy")
+    img = make_image(mode, (40, 30))
+    data = payload[:example.lsb_capacity(img, bits) // 8 - 100]
+    a, b = _embed_both(img, [(b"header", 1), (data, bits)])
+    assert a.tobytes() == b.tobytes()
+
+
+@pytest.mark.parametrize("mode", ["RGBA", "LA", "I;16"])
+@pytest.mark.parametrize("bits", [1, 3])
+def test_native_mode_round_trip(mode, bits, payload, tmp_path, make_image):
+    cover, stego, out = tmp_path / "c.png", tmp_path / "s.png", tmp_path / "out.zip"
+    make_image(mode, (96, 64)).save(cover)
+    lsb_embed(str(cover), payload, str(stego), bits=bits)
+    with Image.open(stego) as img:
+        assert img.mode == mode
+    lsb_extract(str(stego), str(out))
+    assert out.read_bytes() == payload
+
+
+@pytest.mark.parametrize("mode", ["RGB", "LA", "I;16"])
+@pytest.mark.parametrize("max_memory", [1, 2000, 10**9])
+def test_strip_embed_matches_whole_image(mode, max_memory, payload, make_image):
+    pytest.importorskip("numpy")
+    img = make_image(mode, (40, 30))
+    parts = [(b"header", 1), (payload[:example.lsb_capacity(img, 2) // 8 - 100], 2)]
+    whole, strips = img.copy(), img.copy()
+    _lsb_embed_numpy(whole, parts)
+    n, rows = example._lsb_embed_bands(strips, parts, max_memory)
+    assert strips.tobytes() == whole.tobytes()
+    if max_memory == 1:
+        assert rows == 1 and n > 1
+
+
+def test_max_memory_output_identical(data_path, payload, tmp_path):
+    pytest.importorskip("numpy")
+    plain, banded, stats = tmp_path / "a.png", tmp_path / "b.png", {}
+    lsb_embed(data_path("cover.png"), payload, str(plain), version=1)
+    lsb_embed(data_path("cover.png"), payload, str(banded), version=1, max_memory=4096, stats=stats)
+    assert banded.read_bytes() == plain.read_bytes()
+    assert stats["strips"] > 1
+
+
+@pytest.mark.parametrize("name, profile", [("s.png", "balanced"), ("s.bmp", "balanced"),
+                                           ("s.tif", "fastest"), ("s.tif", "smallest")])
+def test_reading_closes_the_carrier(data_path, payload, tmp_path, name, profile):
+    # raw and compressed TIFF, BMP and PNG take different _decode_top paths
+    stego, out = tmp_path / name, tmp_path / "out.zip"
+    lsb_embed(data_path("cover.png"), payload, str(stego), profile=profile)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ResourceWarning)
+        example.probe(str(stego))
+        lsb_extract(str(stego), str(out))
+        gc.collect()
+    assert [w for w in caught if issubclass(w.category, ResourceWarning)] == []
+    assert out.read_bytes() == payload
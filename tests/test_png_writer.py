@@ -0,0 +1,59 @@
+import io
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+
+import example
+from example import write_png_parallel
+
+pytest.importorskip("numpy")
+
+
+def _idat(png: bytes) -> bytes:
+    pos, data = 8, []
+    while pos < len(png):
+        n, tag = struct.unpack(">I4s", png[pos:pos + 8])
+        if tag == b"IDAT":
+            data.append(png[pos + 8:pos + 8 + n])
+        pos += 12 + n
+    return b"".join(data)
+
+
+@pytest.mark.parametrize("mode", ["L", "RGB", "LA", "RGBA", "I;16"])
+@pytest.mark.parametrize("level", [1, 6, 9])
+@pytest.mark.parametrize("threads", [1, 4])
+def test_decodes_like_pillow(mode, level, threads, monkeypatch, make_image):
+    # small blocks so the image spans many deflate pieces
+    monkeypatch.setattr(example, "CHUNK_SIZE", 1000)
+    img = make_image(mode)
+    out = io.BytesIO()
+    write_png_parallel(img, out, level, threads)
+    png = out.getvalue()
+    stride = img.size[0] * example.LSB_MODES[mode] * (2 if mode.startswith("I;16") else 1)
+    assert len(zlib.decompress(_idat(png))) == img.size[1] * (stride + 1)
+    with Image.open(io.BytesIO(png)) as back:
+        assert back.mode == mode
+        assert back.tobytes() == img.tobytes()
+
+
+def test_keeps_icc_and_transparency(tmp_path, make_image):
+    img = make_image("RGB")
+    img.info["icc_profile"] = b"not really an ICC profile"
+    img.info["transparency"] = (1, 2, 3)
+    out = tmp_path / "t.png"
+    write_png_parallel(img, str(out))
+    with Image.open(out) as back:
+        assert back.info["icc_profile"] == b"not really an ICC profile"
+        assert back.info["transparency"] == (1, 2, 3)
+
+
+def test_lsb_embed_png_threads_matches_pillow(data_path, payload, tmp_path):
+    threaded, plain, out = tmp_path / "t.png", tmp_path / "p.png", tmp_path / "out.zip"
+    example.lsb_embed(data_path("cover.png"), payload, str(threaded), png_threads=2)
+    example.lsb_embed(data_path("cover.png"), payload, str(plain))
+    with Image.open(threaded) as a, Image.open(plain) as b:
+        assert a.tobytes() == b.tobytes()
+    example.lsb_extract(str(threaded), str(out))
+    assert out.read_bytes() == payload
@@ -0,0 +1,68 @@
+import pytest
+
+from example import (SHARD_HEADER, _lsb_body_capacity, lsb_embed, lsb_embed_shards, lsb_extract,
+                     lsb_extract_shards, probe)
+
+SIZES = [(40, 20), (30, 20), (48, 24)]  # no one of them holds the test payload
+
+
+@pytest.fixture
+def covers(tmp_path, make_image):
+    paths = []
+    for i, size in enumerate(SIZES):
+        path = tmp_path / f"cover{i}.png"
+        make_image("RGB", size, seed=i).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def _embed(covers, payload, tmp_path, tag, **kwargs):
+    outs = [str(tmp_path / f"{tag}{i}.png") for i in range(len(covers))]
+    assert lsb_embed_shards(covers, payload, outs, workers=1, **kwargs) == outs
+    return outs
+
+
+@pytest.mark.parametrize("password", [None, "pw"])
+def test_round_trip_any_order(covers, payload, tmp_path, password, fast_kdf, make_image):
+    outs = _embed(covers, payload, tmp_path, "s", password=password, kdf=fast_kdf)
+    out = tmp_path / "out.zip"
+    lsb_extract_shards([outs[2], outs[0], outs[1]], str(out), password, workers=1)
+    assert out.read_bytes() == payload
+
+    hits = [probe(path)[0] for path in outs]
+    assert [hit["shard"] for hit in hits] == ["1/3", "2/3", "3/3"]
+    assert len({hit["set"] for hit in hits}) == 1
+    assert all(hit["encrypted"] == bool(password) for hit in hits)
+    # slices are shared in proportion to each cover's capacity
+    caps = [_lsb_body_capacity(make_image("RGB", size), 1) - SHARD_HEADER.size for size in SIZES]
+    slices = [hit["size"] - SHARD_HEADER.size for hit in hits]
+    for size, cap in zip(slices, caps):
+        assert size <= cap
+        assert abs(size - sum(slices) * cap / sum(caps)) < 2  # each rounds up on what is left
+
+
+def test_shard_errors(covers, payload, tmp_path):
+    a = _embed(covers, payload, tmp_path, "a")
+    b = _embed(covers, payload, tmp_path, "b")
+    out = tmp_path / "out.zip"
+    with pytest.raises(ValueError, match="Missing shards 2 of 3"):
+        lsb_extract_shards([a[0], a[2]], str(out), workers=1)
+    with pytest.raises(ValueError, match="Duplicate shards"):
+        lsb_extract_shards([a[0], a[1], a[1], a[2]], str(out), workers=1)
+    with pytest.raises(ValueError, match="2 different shard sets"):
+        lsb_extract_shards([a[0], b[1], b[2]], str(out), workers=1)
+    with pytest.raises(ValueError, match="one shard of a multi-cover payload"):
+        lsb_extract(a[0], str(out))
+    assert not out.exists()
+
+
+def test_not_a_shard(covers, payload, tmp_path, data_path):
+    single = tmp_path / "single.png"
+    lsb_embed(data_path("cover.png"), payload, str(single))
+    with pytest.raises(ValueError, match="not a shard"):
+        lsb_extract_shards([str(single)], str(tmp_path / "out.zip"), workers=1)
+
+
+def test_payload_too_large(covers, tmp_path):
+    with pytest.raises(ValueError, match="Payload too large for these covers"):
+        _embed(covers, bytes(5000), tmp_path, "s")
@@ -0,0 +1,87 @@
+import io
+import random
+import struct
+import zipfile
+
+import pytest
+
+import example
+from example import CHUNK_SIZE, append_embed, append_extract, stream_payload, zip_folder_to_bytes
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIII")
+
+
+@pytest.fixture
+def folder(tmp_path):
+    # one file per _zip_write_entry path: empty, single block, exactly one
+    # block, several deflated blocks, and a stored file of several blocks
+    rng = random.Random(3)
+    words = [b"alpha", b"beta", b"gamma", b"delta", b"stego", b"box"]
+    files = {
+        "empty.txt": b"",
+        "small.txt": b"hello\n" * 100,
+        "exact.txt": bytes(i % 7 + 48 for i in range(CHUNK_SIZE)),
+        "sub/multi.txt": b" ".join(rng.choice(words) for _ in range(700_000)),
+        "photo.jpg": rng.getrandbits(8 * (CHUNK_SIZE + CHUNK_SIZE // 2)).to_bytes(
+            CHUNK_SIZE + CHUNK_SIZE // 2, "little"),
+    }
+    root = tmp_path / "folder"
+    for name, data in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return root, files
+
+
+def _check(archive: bytes, files: dict):
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        assert zf.testzip() is None
+        assert {i.filename: zf.read(i) for i in zf.infolist()} == files
+        return {i.filename: i for i in zf.infolist()}
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_folder_round_trip(folder, workers):
+    root, files = folder
+    stats = {}
+    infos = _check(zip_folder_to_bytes(str(root), workers, stats), files)
+    assert infos["photo.jpg"].compress_type == zipfile.ZIP_STORED
+    assert infos["sub/multi.txt"].compress_type == zipfile.ZIP_DEFLATED
+    assert infos["sub/multi.txt"].compress_size < infos["sub/multi.txt"].file_size // 2
+    assert stats["entries"] == len(files) and stats["stored"] == 1
+
+
+def test_seekable_target_has_no_data_descriptors(folder):
+    # sizes are patched into the local headers, as zipfile does
+    root, files = folder
+    archive = zip_folder_to_bytes(str(root))
+    for name, info in _check(archive, files).items():
+        sig, _, flags, _, _, _, crc, csize, usize = LOCAL_HEADER.unpack_from(archive, info.header_offset)
+        assert sig == 0x04034B50
+        assert not flags & 0x08, name
+        assert (crc, csize, usize) == (info.CRC, info.compress_size, info.file_size)
+
+
+def test_non_seekable_target(folder, data_path, tmp_path):
+    # format 2 append streams the ZIP through the container's chunk indexer
+    root, files = folder
+    stego, out = tmp_path / "s.png", tmp_path / "out.zip"
+    append_embed(data_path("cover.png"), stream_payload(input_folder=str(root)), str(stego))
+    append_extract(str(stego), str(out))
+    infos = _check(out.read_bytes(), files)
+    assert infos["sub/multi.txt"].flag_bits & 0x08
+
+
+def test_format_1_append_after_cover(folder, data_path, tmp_path):
+    # the ZIP starts after the cover, so header offsets are relative to it
+    root, files = folder
+    stego, out = tmp_path / "s.png", tmp_path / "out.zip"
+    append_embed(data_path("cover.png"), stream_payload(input_folder=str(root)), str(stego), version=1)
+    append_extract(str(stego), str(out))
+    _check(out.read_bytes(), files)
+
+
+def test_should_store():
+    assert example._should_store("a.JPG", b"")
+    assert not example._should_store("a.txt", b"a" * 100_000)
+    assert example._should_store("a.bin", random.Random(0).getrandbits(8 * 100_000).to_bytes(100_000, "little"))